@@ -1,7 +1,11 @@
 from django.contrib import admin
 
 from django.contrib import admin
-from .models import Category, Product, ProductImage, Inventory, Unit, CarouselBanner, Sale, BusinessSettings
+from django.db.models import F
+from .models import (
+    Category, Product, ProductImage, Inventory, Unit, CarouselBanner, Sale, BusinessSettings, StockMovement,
+    SalesDailyRollup, ProductForecast,
+)
 from .forms import ProductImageForm, CarouselBannerForm
 
 @admin.register(BusinessSettings)
@@ -40,6 +44,7 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ("category", "is_active")
     search_fields = ("name", "slug", "description")
     prepopulated_fields = {"slug": ("name",)}
+    readonly_fields = ("quantity",)  # changed through Inventory movements so the stock ledger sees it
     inlines = [ProductImageInline, InventoryInline]
 
 @admin.register(CarouselBanner)
@@ -58,6 +63,56 @@ class InventoryAdmin(admin.ModelAdmin):
     search_fields = ("product__name",)
     readonly_fields = ("sku",)
 
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ("product", "delta", "kind", "created_at")
+    list_filter = ("kind", "created_at")
+    search_fields = ("product__name",)
+
+    # The ledger is append-only; rows are written by Inventory and Sale
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(SalesDailyRollup)
+class SalesDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ("date", "product", "category", "units", "revenue", "transactions")
+    list_filter = ("date", "category")
+    search_fields = ("product__name",)
+
+    # Maintained from Sale; rebuild with the rebuild_sales_rollups command
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(ProductForecast)
+class ProductForecastAdmin(admin.ModelAdmin):
+    list_display = (
+        "product", "quantity", "smoothed_demand", "moving_average", "days_of_cover", "reorder_point",
+        "needs_restock", "computed_at",
+    )
+    list_filter = ("needs_restock", "product__category")
+    search_fields = ("product__name",)
+    list_select_related = ("product__unit",)
+    ordering = (F("days_of_cover").asc(nulls_last=True),)
+
+    # Rewritten by the forecast_demand command
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 
 # Optional: register directly (if you want quick access too)
 admin.site.register(ProductImage)
@@ -1,5 +1,16 @@
-from rest_framework import serializers
-from .models import Category, Product, ProductImage, Unit, CarouselBanner, Sale, BusinessSettings
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from .images import srcset
+from .metrics import STOCK_OUTS
+from .models import (
+    Category, Product, ProductImage, Unit, CarouselBanner, Sale, BusinessSettings, OutOfStock, ProductForecast,
+)
+
+
+class StockConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Not enough stock."
+    default_code = "out_of_stock"
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -8,6 +19,17 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ("id", "name", "slug", "description", "icon")
 
 
+class CategoryListSerializer(CategorySerializer):
+    """Category with the storefront's "N items, from C$X" aggregates (see Category.with_product_stats)."""
+    product_count = serializers.IntegerField(read_only=True)
+    in_stock_count = serializers.IntegerField(read_only=True)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + ("product_count", "in_stock_count", "min_price", "max_price")
+
+
 class UnitSerializer(serializers.ModelSerializer):
     class Meta:
         model = Unit
@@ -15,9 +37,14 @@ class UnitSerializer(serializers.ModelSerializer):
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = ProductImage
-        fields = ("id", "tag", "is_primary", "alt_text", "image")  # now just returns the URL
+        fields = ("id", "tag", "is_primary", "alt_text", "image", "srcset")  # now just returns the URL
+
+    def get_srcset(self, obj):
+        return srcset(obj.image, obj.variants)
 
 
 class ProductListSerializer(serializers.ModelSerializer):
@@ -42,7 +69,11 @@ class ProductListSerializer(serializers.ModelSerializer):
         )
 
     def get_primary_image(self, obj):
-        img = obj.images.order_by("-is_primary", "id").first()
+        # Use the prefetched images (ordered by ProductImage.Meta) instead of a query per row
+        images = getattr(obj, "primary_images", None)
+        if images is None:
+            images = obj.images.all()
+        img = images[0] if images else None
         return ProductImageSerializer(img, context=self.context).data if img else None
 
     def get_in_stock(self, obj):
@@ -60,9 +91,14 @@ class ProductDetailSerializer(ProductListSerializer):
 
 
 class CarouselBannerSerializer(serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = CarouselBanner
-        fields = ["id", "title", "description", "image", "link", "order", "is_active"]
+        fields = ["id", "title", "description", "image", "srcset", "link", "order", "is_active"]
+
+    def get_srcset(self, obj):
+        return srcset(obj.image, obj.variants)
 
 
 class SaleSerializer(serializers.ModelSerializer):
@@ -74,13 +110,76 @@ class SaleSerializer(serializers.ModelSerializer):
         product = data["product"]
         quantity = data["quantity"]
         if quantity > product.quantity:
+            STOCK_OUTS.labels("sale").inc()
             raise serializers.ValidationError(
                 f"Not enough stock: only {product.quantity} left."
             )
         return data
 
+    def create(self, validated_data):
+        # validate() may have seen a stale quantity; the model's conditional update is authoritative
+        try:
+            return super().create(validated_data)
+        except OutOfStock as exc:
+            raise StockConflict(exc.messages[0])
+
+
+class OrderLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+    sold_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+
+
+class OrderSerializer(serializers.Serializer):
+    lines = OrderLineSerializer(many=True, allow_empty=False)
+
+    def validate_lines(self, lines):
+        # Resolve every product in one query instead of one per line
+        ids = {line["product"] for line in lines}
+        products = Product.objects.filter(is_active=True).in_bulk(ids)
+        missing = sorted(ids - set(products))
+        if missing:
+            raise serializers.ValidationError(f"Unknown products: {', '.join(map(str, missing))}.")
+
+        wanted = {}
+        for line in lines:
+            line["product"] = products[line["product"]]
+            wanted[line["product"].pk] = wanted.get(line["product"].pk, 0) + line["quantity"]
+        for pk, quantity in wanted.items():
+            if quantity > products[pk].quantity:
+                STOCK_OUTS.labels("order").inc()
+                raise serializers.ValidationError(
+                    f"Not enough stock for {products[pk].name}: only {products[pk].quantity} left."
+                )
+        return lines
+
+    def create(self, validated_data):
+        try:
+            sales = Sale.book(
+                (line["product"], line["quantity"], line["sold_price"])
+                for line in validated_data["lines"]
+            )
+        except OutOfStock as exc:
+            raise StockConflict(exc.messages[0])
+        return {"lines": sales}
+
+    def to_representation(self, instance):
+        return {"lines": SaleSerializer(instance["lines"], many=True).data}
+
 
 class BusinessSettingsSerializer(serializers.ModelSerializer):
     class Meta:
         model = BusinessSettings
-        fields = ["id", "name", "whatsapp_number"]
\ No newline at end of file
+        fields = ["id", "name", "whatsapp_number"]
+
+
+class ProductForecastSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source="product.name", read_only=True)
+    category = serializers.CharField(source="product.category.name", read_only=True)
+
+    class Meta:
+        model = ProductForecast
+        fields = [
+            "product", "product_name", "category", "quantity", "moving_average", "smoothed_demand",
+            "demand_std", "days_of_cover", "reorder_point", "needs_restock", "computed_at",
+        ]
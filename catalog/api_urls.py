@@ -1,14 +1,28 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .api_views import CategoryViewSet, ProductViewSet, CarouselBannerViewSet, BusinessSettingsViewSet
+from .api_views import (
+    CategoryViewSet, ProductViewSet, CarouselBannerViewSet, BusinessSettingsViewSet, OrderViewSet, ProductForecastViewSet,
+    SaleViewSet, RequestStatsView, ExportView, SalesReportView,
+)
+from .async_views import async_read_patterns
 
 router = DefaultRouter()
 router.register(r"categories", CategoryViewSet, basename="category")
 router.register(r"products", ProductViewSet, basename="product")
 router.register(r'carousel', CarouselBannerViewSet, basename="carousel")
 router.register(r'settings', BusinessSettingsViewSet, basename="settings")
+router.register(r"orders", OrderViewSet, basename="order")
+router.register(r"sales", SaleViewSet, basename="sale")
+router.register(r"forecasts", ProductForecastViewSet, basename="forecast")
 
+router_urls = router.urls
+if settings.ASYNC_CATALOG:
+    router_urls = async_read_patterns(router_urls)
 
 urlpatterns = [
-    path("", include(router.urls)),
+    path("_stats/", RequestStatsView.as_view(), name="request-stats"),
+    path("exports/<str:kind>/", ExportView.as_view(), name="export"),
+    path("reports/sales/", SalesReportView.as_view(), name="sales-report"),
+    path("", include(router_urls)),
 ]
\ No newline at end of file
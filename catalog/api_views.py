@@ -1,32 +1,57 @@
+from datetime import date
+
 from rest_framework import viewsets, mixins
-from rest_framework.filters import SearchFilter
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.db.models import F
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Category, Product, CarouselBanner, Sale, BusinessSettings
+from utils.request_stats import endpoint_stats
+from .models import Category, Product, ProductImage, Unit, CarouselBanner, Sale, BusinessSettings, ProductForecast
+from .cache import CatalogCacheMixin
+from .cards import ProductCardListMixin, card_queryset
+from .exports import CONTENT_TYPES, EXPORTS, ExportError, stream_export
+from .fast_serializers import FastCarouselBannerSerializer, FastCategoryListSerializer, FastListMixin
+from .pagination import ProductCursorPagination
+from .reports import GRANULARITIES, GROUP_BY, sales_report
+from .renderers import StreamingListMixin
+from .search import ProductSearchFilter
+from .suggest import suggestions
 from .api_serializers import (
-    CategorySerializer,
+    CategoryListSerializer,
     ProductListSerializer,
     ProductDetailSerializer,
     CarouselBannerSerializer,
     SaleSerializer,
-    BusinessSettingsSerializer
+    OrderSerializer,
+    BusinessSettingsSerializer,
+    ProductForecastSerializer,
 )
 
 
-class CategoryViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
-    queryset = Category.objects.filter(is_active=True).order_by("name")
-    serializer_class = CategorySerializer
+class CategoryViewSet(CatalogCacheMixin, FastListMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    # Product writes (including stock changes) move the aggregates too
+    cache_models = (Category, Product)
+    validator_fields = ("updated_at", "products__updated_at")
+    validator_counts = ("products",)
+    fast_serializer_class = FastCategoryListSerializer
+    queryset = Category.with_product_stats(Category.objects.filter(is_active=True)).order_by("name")
+    serializer_class = CategoryListSerializer
 
 
-class ProductViewSet(mixins.ListModelMixin,
+class ProductViewSet(CatalogCacheMixin,
+                     ProductCardListMixin,
                      mixins.RetrieveModelMixin,
                      viewsets.GenericViewSet):
-    queryset = (
-        Product.objects.filter(is_active=True)
-        .select_related("category", "unit")
-        .prefetch_related("images")
-        .order_by("-updated_at")
-    )
-    filter_backends = [SearchFilter, DjangoFilterBackend]
+    cache_models = (Product, ProductImage, Category, Unit)
+    validator_fields = ("updated_at", "category__updated_at", "unit__updated_at", "images__updated_at")
+    validator_counts = ("images",)
+    queryset = Product.objects.filter(is_active=True).order_by("-updated_at", "-id")
+    pagination_class = ProductCursorPagination
+    filter_backends = [ProductSearchFilter, DjangoFilterBackend]
     search_fields = ["name", "description"]
     filterset_fields = {"category__slug": ["exact"]}
 
@@ -35,21 +60,127 @@ class ProductViewSet(mixins.ListModelMixin,
 
     def get_queryset(self):
         qs = super().get_queryset()
+        if self.action == "list":
+            # Rows come pre-rendered from ProductCard, see ProductCardListMixin
+            qs = card_queryset(qs)
+        else:
+            qs = qs.select_related("category", "unit").defer("search_vector").prefetch_related("images")
         in_stock = self.request.query_params.get("in_stock")
         if in_stock in ("1", "true", "True"):
             qs = qs.filter(quantity__gt=0)
         return qs
 
-class CarouselBannerViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=["get"])
+    def suggest(self, request):
+        """Typeahead served from the in-memory prefix index (no database hit)."""
+        try:
+            limit = min(int(request.query_params.get("limit", 8)), 20)
+        except ValueError:
+            limit = 8
+        return Response(suggestions(request.query_params.get("q", ""), max(limit, 1)))
+
+class CarouselBannerViewSet(CatalogCacheMixin, FastListMixin, viewsets.ModelViewSet):
+    cache_models = (CarouselBanner,)
+    fast_serializer_class = FastCarouselBannerSerializer
     queryset = CarouselBanner.objects.filter(is_active=True).order_by("order")
     serializer_class = CarouselBannerSerializer
 
 
-class SaleViewSet(viewsets.ModelViewSet):
+class SaleViewSet(StreamingListMixin, viewsets.ReadOnlyModelViewSet):
+    """Sales history for the back office; new sales go through /api/orders/."""
     queryset = Sale.objects.all().order_by("-created_at")
     serializer_class = SaleSerializer
+    permission_classes = [IsAdminUser]
+
+
+class OrderViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
+    """Checkout: books a whole basket of sales or none of it."""
+    serializer_class = OrderSerializer
+    # Prices come from the request: only staff may book sales
+    permission_classes = [IsAdminUser]
 
 
-class BusinessSettingsViewSet(viewsets.ReadOnlyModelViewSet):
+class BusinessSettingsViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
+    cache_models = (BusinessSettings,)
     queryset = BusinessSettings.objects.all()
-    serializer_class = BusinessSettingsSerializer
\ No newline at end of file
+    serializer_class = BusinessSettingsSerializer
+
+
+class RequestStatsView(APIView):
+    """Rolling per-endpoint query count and timing percentiles (admin only)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(endpoint_stats.snapshot())
+
+
+class ProductForecastViewSet(StreamingListMixin, viewsets.ReadOnlyModelViewSet):
+    """Demand forecasts and reorder points, most urgent first (admin only, see forecast_demand)."""
+    permission_classes = [IsAdminUser]
+    queryset = (
+        ProductForecast.objects.select_related("product__category")
+        .order_by(F("days_of_cover").asc(nulls_last=True), "product_id")
+    )
+    serializer_class = ProductForecastSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["needs_restock", "product__category__slug"]
+
+
+def date_params(request):
+    """``(start, end)`` from the optional ``?from=`` / ``?to=`` ISO dates."""
+    params = request.query_params
+    try:
+        start = date.fromisoformat(params["from"]) if params.get("from") else None
+        end = date.fromisoformat(params["to"]) if params.get("to") else None
+    except ValueError:
+        raise ValidationError("from and to must be dates (YYYY-MM-DD).")
+    return start, end
+
+
+class ExportView(APIView):
+    """
+    Streams ``sales`` or ``inventory`` as CSV or Parquet (admin only).
+
+    ``?from=YYYY-MM-DD&to=YYYY-MM-DD`` limits the rows by ``created_at`` (both
+    days included); ``?output=parquet`` switches the format.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, kind):
+        if kind not in EXPORTS:
+            raise NotFound(f"Unknown export {kind!r}.")
+        start, end = date_params(request)
+        fmt = request.query_params.get("output", "csv")
+        try:
+            chunks = stream_export(kind, fmt, start, end)
+        except ExportError as exc:
+            raise ValidationError(str(exc))
+
+        response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[fmt])
+        period = "_".join(str(day) for day in (start, end) if day) or "all"
+        response["Content-Disposition"] = f'attachment; filename="{kind}-{period}.{fmt}"'
+        return response
+
+
+class SalesReportView(APIView):
+    """
+    Units, revenue and sale count per period from the daily rollups (admin only).
+
+    ``?from=&to=`` (days, inclusive), ``?granularity=day|week|month`` and
+    ``?group_by=none|product|category``.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        start, end = date_params(request)
+        granularity = request.query_params.get("granularity", "day")
+        group_by = request.query_params.get("group_by", "none")
+        if granularity not in GRANULARITIES:
+            raise ValidationError(f"granularity must be one of {', '.join(GRANULARITIES)}.")
+        if group_by not in GROUP_BY:
+            raise ValidationError(f"group_by must be one of {', '.join(GROUP_BY)}.")
+        return Response({
+            "granularity": granularity,
+            "group_by": group_by,
+            "results": list(sales_report(start, end, granularity, group_by)),
+        })
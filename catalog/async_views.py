@@ -0,0 +1,150 @@
+"""
+Async read path for the catalog endpoints, used under ASGI (``ASYNC_CATALOG``).
+
+``async_read_patterns`` wraps the router's list/detail routes of the
+categories, products, carousel and settings. JSON ``GET``/``HEAD`` requests are
+answered by a coroutine that borrows the DRF viewset for everything that does
+no I/O (queryset, filters, search, serializers, cache key, ETag) and reads
+with the async ORM (``aiterator``, ``aget``, ``aaggregate``), so a request
+waiting on the database no longer holds the worker. Responses, cache
+entries and ETags are the ones the DRF views produce.
+
+Django 4.2 runs every async ORM and cache call in a thread
+(``sync_to_async``), and each of those hops costs more than a local cache
+read, so the response cache is read in one hop and written in another.
+
+Anything else -- writes, the browsable API, errors such as a bad cursor or
+a missing object -- is handed to the DRF view unchanged.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.http import HttpResponse
+from django.urls import URLPattern
+from django.utils.cache import get_conditional_response
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import AllowAny
+
+from .cards import card_payloads, card_results, refresh_product_cards
+from .metrics import CACHE_LOOKUPS
+from .renderers import dumps
+
+# Router URL names served asynchronously
+ASYNC_ROUTES = {
+    "category-list",
+    "product-list",
+    "product-detail",
+    "carousel-list",
+    "carousel-detail",
+    "settings-list",
+    "settings-detail",
+}
+
+
+class UseSyncView(Exception):
+    """The request needs the DRF view (an error response, most likely)."""
+
+
+def wants_json(request, kwargs):
+    fmt = kwargs.get("format") or request.GET.get("format")
+    if fmt is not None:
+        return fmt == "json"
+    return "text/html" not in request.headers.get("Accept", "")
+
+
+def build_viewset(sync_view, request, args, kwargs):
+    """A viewset set up the way the router's view would set it up for ``request``."""
+    viewset = sync_view.cls(**sync_view.initkwargs)
+    viewset.action_map = sync_view.actions
+    for method, action in sync_view.actions.items():
+        setattr(viewset, method, getattr(viewset, action))
+    viewset.action = sync_view.actions["get"]
+    viewset.args, viewset.kwargs = args, kwargs
+    viewset.format_kwarg = None
+    viewset.request = viewset.initialize_request(request, *args, **kwargs)
+    viewset.headers = viewset.default_response_headers
+    # No authentication runs on this path: only public endpoints qualify
+    if not all(isinstance(permission, AllowAny) for permission in viewset.get_permissions()):
+        raise UseSyncView
+    return viewset
+
+
+async def list_data(viewset):
+    queryset = viewset.filter_queryset(viewset.get_queryset())
+    if viewset.paginator is not None:
+        # DRF's cursor paginator reads its page synchronously; run it in a
+        # thread the way the async ORM runs its queries
+        products = await sync_to_async(viewset.paginate_queryset)(queryset)
+        payloads, missing = card_payloads(products)
+        if missing:
+            payloads.update(await sync_to_async(refresh_product_cards)(missing))
+        return viewset.get_paginated_response(card_results(products, payloads)).data
+
+    fast_serializer_class = getattr(viewset, "fast_serializer_class", None)
+    if fast_serializer_class is not None and settings.CATALOG_FAST_SERIALIZERS:
+        return await fast_serializer_class().aserialize(queryset)
+    return viewset.get_serializer([row async for row in queryset.aiterator()], many=True).data
+
+
+async def retrieve_data(viewset):
+    queryset = viewset.filter_queryset(viewset.get_queryset())
+    lookup_url_kwarg = viewset.lookup_url_kwarg or viewset.lookup_field
+    try:
+        instance = await queryset.aget(**{viewset.lookup_field: viewset.kwargs[lookup_url_kwarg]})
+    except (ObjectDoesNotExist, TypeError, ValueError, ValidationError):
+        raise UseSyncView
+    return viewset.get_serializer(instance).data
+
+
+def cache_lookup(viewset, request):
+    key = viewset.get_response_cache_key(request)
+    return key, cache.get(key)
+
+
+async def cached_read(viewset, request):
+    """``CatalogCacheMixin.cached_response`` with async I/O, rendered as JSON."""
+    key, entry = await sync_to_async(cache_lookup)(viewset, request)
+    CACHE_LOOKUPS.labels(viewset.basename, "miss" if entry is None else "hit").inc()
+    if entry is None:
+        fingerprint, last_modified = await viewset.aget_validators()
+    else:
+        data, fingerprint, last_modified = entry
+
+    etag = viewset.get_etag(request, fingerprint, format="json")
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if entry is None:
+            data = await (list_data(viewset) if viewset.action == "list" else retrieve_data(viewset))
+            await sync_to_async(cache.set)(key, (data, fingerprint, last_modified), settings.CATALOG_CACHE_TIMEOUT)
+        response = HttpResponse(dumps(data), content_type="application/json")
+    for header, value in viewset.headers.items():
+        response[header] = value
+    return viewset.set_validator_headers(response, etag, last_modified)
+
+
+def async_read_view(sync_view):
+    """Serve JSON reads of ``sync_view`` (a router view) asynchronously, the rest through it."""
+
+    @functools.wraps(sync_view)
+    async def view(request, *args, **kwargs):
+        if request.method in ("GET", "HEAD") and wants_json(request, kwargs):
+            try:
+                viewset = build_viewset(sync_view, request, args, kwargs)
+                return await cached_read(viewset, request)
+            except (UseSyncView, APIException):
+                pass
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+    return view
+
+
+def async_read_patterns(patterns):
+    """``patterns`` (the router's URLs) with the ``ASYNC_ROUTES`` views made async."""
+    return [
+        URLPattern(pattern.pattern, async_read_view(pattern.callback), pattern.default_args, pattern.name)
+        if isinstance(pattern, URLPattern) and pattern.name in ASYNC_ROUTES else pattern
+        for pattern in patterns
+    ]
@@ -0,0 +1,148 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from utils.db_routers import stay_on_primary
+
+from .metrics import CACHE_LOOKUPS
+
+
+def _version_key(model):
+    return f"catalog:version:{model._meta.label_lower}"
+
+
+def get_catalog_versions(models):
+    """Current version counter for each model, seeding missing ones."""
+    return get_versions([_version_key(model) for model in models])
+
+
+def get_versions(keys):
+    """Current value of each version counter in ``keys``, seeding missing ones."""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Seed with a timestamp so an evicted counter never reuses an old version
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_catalog_version(model):
+    # Before the new version is visible, so a lagging replica never fills its cache entries
+    stay_on_primary()
+    bump_version(_version_key(model))
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+class CatalogCacheMixin:
+    """
+    HTTP caching for the read-only catalog actions.
+
+    Responses are cached until one of ``cache_models`` changes. Keys embed the
+    models' version counters, which the catalog signals bump on every
+    save/delete, so a write simply makes the old entries unreachable.
+
+    Every response also carries a strong ``ETag`` and ``Last-Modified`` built
+    from ``max()`` of ``validator_fields`` plus the row count (and the count of
+    each ``validator_counts`` relation) of the filtered queryset. Matching
+    ``If-None-Match``/``If-Modified-Since`` headers get a 304 without
+    serializing anything.
+
+    Safe requests read from the replica when one is configured
+    (``utils.db_routers``).
+    """
+    cache_models = ()
+    replica_reads = True
+    validator_fields = ("updated_at",)
+    validator_counts = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_response_cache_key(self, request):
+        versions = ".".join(str(v) for v in get_catalog_versions(self.cache_models))
+        url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        return f"catalog:response:{self.basename}:{versions}:{url}"
+
+    def get_validator_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset.order_by()
+
+    def get_validator_aggregates(self):
+        aggregates = {f"max_{i}": Max(field) for i, field in enumerate(self.validator_fields)}
+        aggregates["count"] = Count("pk", distinct=True)
+        for i, relation in enumerate(self.validator_counts):
+            aggregates[f"count_{i}"] = Count(relation, distinct=True)
+        return aggregates
+
+    def get_validators(self):
+        """Return ``(fingerprint, last_modified)`` for the current action's rows."""
+        values = self.get_validator_queryset().aggregate(**self.get_validator_aggregates())
+        return self.validators_from(values)
+
+    async def aget_validators(self):
+        """``get_validators`` for async code."""
+        values = await self.get_validator_queryset().aaggregate(**self.get_validator_aggregates())
+        return self.validators_from(values)
+
+    def validators_from(self, values):
+        timestamps = [values[f"max_{i}"] for i in range(len(self.validator_fields))]
+        timestamps = [ts for ts in timestamps if ts is not None]
+        last_modified = int(max(timestamps).timestamp()) if timestamps else None
+        fingerprint = ":".join(
+            value.isoformat() if hasattr(value, "isoformat") else str(value)
+            for _, value in sorted(values.items())
+        )
+        return fingerprint, last_modified
+
+    def get_etag(self, request, fingerprint, format=None):
+        # The fingerprint covers the data; the renderer format covers the representation
+        raw = f"{format or request.accepted_renderer.format}:{fingerprint}"
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+    def set_validator_headers(self, response, etag, last_modified):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        entry = cache.get(key)
+        CACHE_LOOKUPS.labels(self.basename, "miss" if entry is None else "hit").inc()
+        if entry is None:
+            fingerprint, last_modified = self.get_validators()
+        else:
+            data, fingerprint, last_modified = entry
+
+        etag = self.get_etag(request, fingerprint)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return self.set_validator_headers(not_modified, etag, last_modified)
+
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            cache.set(key, (response.data, fingerprint, last_modified), settings.CATALOG_CACHE_TIMEOUT)
+        else:
+            response = Response(data)
+        return self.set_validator_headers(response, etag, last_modified)
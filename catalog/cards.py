@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.db.models import Prefetch
+from rest_framework import mixins
+from rest_framework.response import Response
+
+from utils.db_routers import read_from_primary
+
+from .api_serializers import ProductListSerializer
+from .fast_serializers import FastProductListSerializer
+from .models import Product, ProductCard, ProductImage
+
+# Rendered live from Product.quantity, everything else comes from the card
+STOCK_FIELDS = ("in_stock", "availability")
+
+
+def primary_image_prefetch():
+    """Prefetch only the image the list renders into ``primary_images``."""
+    return Prefetch("images", queryset=ProductImage.primary_per_product(), to_attr="primary_images")
+
+
+def render_cards(product_ids):
+    """Render the list payload of ``product_ids``: ``{id: payload}``."""
+    if settings.CATALOG_FAST_SERIALIZERS:
+        rows = FastProductListSerializer().serialize(Product.objects.filter(pk__in=product_ids))
+        return {row["id"]: {k: v for k, v in row.items() if k not in STOCK_FIELDS} for row in rows}
+
+    products = (
+        Product.objects.filter(pk__in=product_ids)
+        .select_related("category", "unit")
+        .defer("search_vector")
+        .prefetch_related(primary_image_prefetch())
+    )
+    payloads = {}
+    for row in ProductListSerializer(products, many=True).data:
+        payloads[row["id"]] = {k: v for k, v in row.items() if k not in STOCK_FIELDS}
+    return payloads
+
+
+def refresh_product_cards(product_ids):
+    """Re-render and upsert the cards of ``product_ids``; drop cards of vanished products."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    # Cards go to the primary: render them from it, not from a lagging replica
+    read_from_primary()
+    payloads = render_cards(product_ids)
+    ProductCard.objects.bulk_create(
+        [ProductCard(product_id=pk, payload=payload) for pk, payload in payloads.items()],
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=["payload", "updated_at"],
+    )
+    ProductCard.objects.filter(product_id__in=product_ids - set(payloads)).delete()
+    return payloads
+
+
+def card_queryset(queryset):
+    """Narrow a product queryset to what a card listing reads."""
+    return queryset.select_related("card").only("id", "updated_at", "quantity", "card__payload")
+
+
+class ProductCardListMixin(mixins.ListModelMixin):
+    """
+    Lists products from their ``ProductCard`` instead of running the
+    serializer per row. Products without a card yet are rendered (and their
+    card stored) on the fly.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        products = list(queryset) if page is None else page
+
+        payloads, missing = card_payloads(products)
+        if missing:
+            payloads.update(refresh_product_cards(missing))
+        results = card_results(products, payloads)
+        if page is None:
+            return Response(results)
+        return self.get_paginated_response(results)
+
+
+def card_payloads(products):
+    """``(payloads, missing)``: the stored card of each product, and the ids without one."""
+    payloads = {}
+    missing = []
+    for product in products:
+        card = getattr(product, "card", None)
+        if card is None:
+            missing.append(product.pk)
+        else:
+            payloads[product.pk] = card.payload
+    return payloads, missing
+
+
+def card_results(products, payloads):
+    return [
+        {**payloads[p.pk], "in_stock": p.quantity > 0, "availability": p.quantity}
+        for p in products
+    ]
@@ -0,0 +1,33 @@
+"""
+Deployment checks for the catalog cache.
+
+Cache version counters (catalog.cache), the suggest index version and the
+read-your-writes window all live in the default cache. With a process-local
+cache (locmem) a write only reaches the worker that made it, and the other
+workers keep serving what they cached.
+"""
+import os
+
+from django.conf import settings
+from django.core import checks
+
+PROCESS_LOCAL_CACHES = ("django.core.cache.backends.locmem.LocMemCache",)
+
+
+def shared_cache_errors(workers):
+    """Errors for running ``workers`` server processes on the configured cache."""
+    backend = settings.CACHES["default"]["BACKEND"]
+    if workers <= 1 or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [checks.Error(
+        f"{workers} workers share no cache: {backend} is per process, so catalog writes don't "
+        "invalidate the other workers' cached responses.",
+        hint="Point CACHE_URL at Redis or Memcached, or run a single worker.",
+        id="catalog.E001",
+    )]
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs=None, **kwargs):
+    # WEB_CONCURRENCY is gunicorn's default worker count
+    return shared_cache_errors(int(os.environ.get("WEB_CONCURRENCY", 1)))
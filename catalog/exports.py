@@ -0,0 +1,162 @@
+"""
+Streaming exports of sales and inventory movements (CSV or Parquet).
+
+Rows are read as tuples with ``.iterator(chunk_size=...)`` (a server-side
+cursor on PostgreSQL) and encoded one chunk at a time, so memory use does
+not depend on how much history is exported. Parquet needs the optional
+``pyarrow`` package; every chunk becomes one row group.
+"""
+import csv
+import io
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.utils import timezone
+
+from .models import Inventory, Sale
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+FORMATS = ("csv", "parquet")
+CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+
+# name -> (model, [(column, lookup, arrow type name)])
+EXPORTS = {
+    "sales": (Sale, [
+        ("id", "id", "int64"),
+        ("created_at", "created_at", "timestamp"),
+        ("product_id", "product_id", "int64"),
+        ("product_slug", "product__slug", "string"),
+        ("product_name", "product__name", "string"),
+        ("category", "category__name", "string"),
+        ("quantity", "quantity", "int64"),
+        ("sold_price", "sold_price", "decimal"),
+    ]),
+    "inventory": (Inventory, [
+        ("id", "id", "int64"),
+        ("created_at", "created_at", "timestamp"),
+        ("sku", "sku", "string"),
+        ("product_id", "product_id", "int64"),
+        ("product_slug", "product__slug", "string"),
+        ("product_name", "product__name", "string"),
+        ("quantity", "quantity", "int64"),
+    ]),
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def date_range(start=None, end=None):
+    """Aware datetimes for ``start``'s midnight and the midnight after ``end`` (both dates optional)."""
+    tz = timezone.get_current_timezone()
+    since = timezone.make_aware(datetime.combine(start, time.min), tz) if start else None
+    until = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz) if end else None
+    return since, until
+
+
+def export_rows(kind, start=None, end=None, chunk_size=2000):
+    """``(columns, rows)`` for an export; ``rows`` is a lazy iterator of tuples oldest first."""
+    if kind not in EXPORTS:
+        raise ExportError(f"Unknown export {kind!r}; choose from {', '.join(EXPORTS)}.")
+    model, spec = EXPORTS[kind]
+    queryset = model.objects.all()
+    since, until = date_range(start, end)
+    if since:
+        queryset = queryset.filter(created_at__gte=since)
+    if until:
+        queryset = queryset.filter(created_at__lt=until)
+    rows = (
+        queryset.order_by("created_at", "id")
+        .values_list(*(lookup for _, lookup, _ in spec))
+        .iterator(chunk_size=chunk_size)
+    )
+    return [column for column, _, _ in spec], rows
+
+
+def _chunks(rows, size):
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def stream_csv(columns, rows, chunk_size=2000):
+    """Yield UTF-8 CSV bytes, header first, one chunk of rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in _chunks(rows, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands over what was written since the last ``drain``."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema(kind):
+    types = {
+        "int64": pyarrow.int64(),
+        "string": pyarrow.string(),
+        "decimal": pyarrow.decimal128(10, 2),
+        "timestamp": pyarrow.timestamp("us", tz="UTC"),
+    }
+    return pyarrow.schema([(column, types[type_name]) for column, _, type_name in EXPORTS[kind][1]])
+
+
+def stream_parquet(kind, rows, chunk_size=2000):
+    """Yield a Parquet file in pieces: one row group per chunk, the footer last."""
+    schema = _arrow_schema(kind)
+    sink = _Sink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    try:
+        for chunk in _chunks(rows, chunk_size):
+            columns = list(zip(*chunk))
+            writer.write_batch(pyarrow.record_batch(
+                [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_export(kind, fmt, start=None, end=None, chunk_size=2000):
+    """Bytes of the ``kind`` export in ``fmt``, produced lazily."""
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format {fmt!r}; choose from {', '.join(FORMATS)}.")
+    if fmt == "parquet" and pyarrow is None:
+        raise ExportError("Parquet exports need the pyarrow package.")
+    columns, rows = export_rows(kind, start, end, chunk_size)
+    if fmt == "csv":
+        return stream_csv(columns, rows, chunk_size)
+    return stream_parquet(kind, rows, chunk_size)
@@ -0,0 +1,212 @@
+"""
+Read-only serializers compiled to plain functions over ``.values()`` rows.
+
+Each ``FastSerializer`` mirrors a DRF serializer (which stays the reference
+implementation, see the parity tests) and produces the same JSON shape
+without DRF's per-field ``get_attribute``/``to_representation`` machinery.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .api_serializers import (
+    CarouselBannerSerializer,
+    CategoryListSerializer,
+    CategorySerializer,
+    ProductImageSerializer,
+    ProductListSerializer,
+)
+from .images import srcset
+from .models import ProductImage
+
+# Fields whose representation of a database value is the value itself
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.FloatField,
+    serializers.ReadOnlyField,
+)
+
+
+def _compile_value(field):
+    """Converter for a non-null database value, or None when it is used as is."""
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    coerce_to_string = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+    if (isinstance(field, serializers.DecimalField) and coerce_to_string and field.decimal_places is not None
+            and field.rounding is None and not field.localize and not field.normalize_output):
+        return f"{{:.{field.decimal_places}f}}".format
+    return field.to_representation
+
+
+def _compile_expression(serializer, fast_class, prefix, namespace):
+    lookups, items = [], []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        key = repr(name)
+        if isinstance(field, serializers.SerializerMethodField):
+            method = getattr(fast_class, f"get_{name}", None)
+            if prefix or method is None:
+                raise ImproperlyConfigured(f"{fast_class.__name__} needs a get_{name}(row) method.")
+            lookups.extend(fast_class.method_lookups.get(name, ()))
+            alias = f"_f{len(namespace)}"
+            namespace[alias] = method
+            items.append(f"{key}: {alias}(self, row)")
+        elif isinstance(field, serializers.ListSerializer):
+            raise ImproperlyConfigured(f"Nested many=True field {name!r} can't be read from .values() rows.")
+        elif isinstance(field, serializers.BaseSerializer):
+            nested_prefix = f"{prefix}{field.source.replace('.', '__')}__"
+            nested_lookups, nested = _compile_expression(field, fast_class, nested_prefix, namespace)
+            pk = repr(f"{nested_prefix}pk")
+            lookups.extend([f"{nested_prefix}pk", *nested_lookups])
+            items.append(f"{key}: None if row[{pk}] is None else {nested}")
+        else:
+            lookup = f"{prefix}{field.source.replace('.', '__')}"
+            lookups.append(lookup)
+            convert = _compile_value(field)
+            if convert is None:
+                items.append(f"{key}: row[{lookup!r}]")
+            else:
+                alias = f"_f{len(namespace)}"
+                namespace[alias] = convert
+                items.append(f"{key}: None if row[{lookup!r}] is None else {alias}(row[{lookup!r}])")
+    return lookups, "{" + ", ".join(items) + "}"
+
+
+def compile_serializer(serializer, fast_class):
+    """
+    Compile ``serializer`` into ``(lookups, render)``: the ``.values()``
+    lookups to fetch and a generated ``render(row, self)`` that builds the
+    serializer's output as a single dict literal. Method fields call
+    ``fast_class.get_<name>(self, row)``.
+    """
+    namespace = {}
+    lookups, expression = _compile_expression(serializer, fast_class, "", namespace)
+    source = f"def render(row, self):\n    return {expression}\n"
+    exec(compile(source, f"<fast {type(serializer).__name__}>", "exec"), namespace)
+    return list(dict.fromkeys(lookups)), namespace["render"]
+
+
+# Compiled once per FastSerializer subclass
+_compiled = {}
+
+
+class FastSerializer:
+    """
+    Subclasses name the reference ``serializer_class``; every
+    ``SerializerMethodField`` needs a ``get_<name>(row)`` method here and the
+    lookups it reads in ``method_lookups``. ``prepare(rows)`` may batch-load
+    whatever those methods need.
+    """
+    serializer_class = None
+    method_lookups = {}
+
+    def __init__(self):
+        compiled = _compiled.get(type(self))
+        if compiled is None:
+            compiled = _compiled[type(self)] = compile_serializer(self.serializer_class(), type(self))
+        self.lookups, self._render = compiled
+
+    def prepare(self, rows):
+        pass
+
+    async def aprepare(self, rows):
+        pass
+
+    def render(self, row):
+        return self._render(row, self)
+
+    def serialize(self, queryset):
+        rows = list(queryset.values(*self.lookups))
+        self.prepare(rows)
+        render = self._render
+        return [render(row, self) for row in rows]
+
+    async def aserialize(self, queryset):
+        """``serialize`` for async code, reading the rows with the async ORM."""
+        rows = [row async for row in queryset.values(*self.lookups).aiterator()]
+        await self.aprepare(rows)
+        render = self._render
+        return [render(row, self) for row in rows]
+
+
+class FastCategorySerializer(FastSerializer):
+    serializer_class = CategorySerializer
+
+
+class FastCategoryListSerializer(FastSerializer):
+    serializer_class = CategoryListSerializer
+
+
+class FastCarouselBannerSerializer(FastSerializer):
+    serializer_class = CarouselBannerSerializer
+    method_lookups = {"srcset": ("image", "variants")}
+
+    def get_srcset(self, row):
+        return srcset(row["image"], row["variants"])
+
+
+class FastProductImageSerializer(FastSerializer):
+    serializer_class = ProductImageSerializer
+    method_lookups = {"srcset": ("image", "variants")}
+
+    def get_srcset(self, row):
+        return srcset(row["image"], row["variants"])
+
+
+class FastProductListSerializer(FastSerializer):
+    serializer_class = ProductListSerializer
+    method_lookups = {
+        "primary_image": ("id",),
+        "in_stock": ("quantity",),
+        "availability": ("quantity",),
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.image_serializer = FastProductImageSerializer()
+        self.primary_images = {}
+
+    def image_rows(self, rows):
+        # One query for every row's primary image, like the list's Prefetch
+        images = ProductImage.primary_per_product(
+            ProductImage.objects.filter(product_id__in=[row["id"] for row in rows])
+        )
+        return images.values("product_id", *self.image_serializer.lookups)
+
+    def prepare(self, rows):
+        self.primary_images = {
+            row["product_id"]: self.image_serializer.render(row) for row in self.image_rows(rows)
+        }
+
+    async def aprepare(self, rows):
+        self.primary_images = {
+            row["product_id"]: self.image_serializer.render(row) async for row in self.image_rows(rows).aiterator()
+        }
+
+    def get_primary_image(self, row):
+        return self.primary_images.get(row["id"])
+
+    def get_in_stock(self, row):
+        return row["quantity"] > 0
+
+    def get_availability(self, row):
+        return row["quantity"]
+
+
+class FastListMixin:
+    """
+    Unpaginated ``list`` rendered by ``fast_serializer_class`` when
+    ``CATALOG_FAST_SERIALIZERS`` is on; the DRF serializer otherwise.
+    """
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if not settings.CATALOG_FAST_SERIALIZERS or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.fast_serializer_class().serialize(queryset))
@@ -0,0 +1,192 @@
+"""
+Resized WebP/AVIF copies ("variants") of the product and banner images.
+
+``ProductImage.image`` and ``CarouselBanner.image`` are URLs of full-size
+originals on Uploadcare. When a row is saved with a new URL, the original is
+downloaded once and encoded at each of ``IMAGE_VARIANT_WIDTHS`` (never wider
+than the original) in each of ``IMAGE_VARIANT_FORMATS``. This runs after
+commit in a pool of ``IMAGE_VARIANT_WORKERS`` threads; Pillow releases the
+GIL while it resizes and encodes.
+
+Files are named after a hash of their content and written to
+``IMAGE_VARIANTS_ROOT``, where WhiteNoise serves them as immutable
+(utils.middleware). The row's ``variants`` field lists them and the
+serializers turn it into one ``srcset`` per format. ``evict_variants``
+deletes the files no row lists any more, once their image was deleted or
+replaced.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.db import connections
+from django.http.request import validate_host
+from PIL import Image, ImageOps, features
+
+from .models import CarouselBanner, ProductImage
+
+logger = logging.getLogger(__name__)
+
+IMAGE_MODELS = (ProductImage, CarouselBanner)
+QUALITY = {"webp": 80, "avif": 60}
+MAX_SOURCE_BYTES = 20 * 1024 * 1024
+DOWNLOAD_TIMEOUT = 10
+# Unlisted files younger than this are kept: the row listing them may not be saved yet
+EVICTION_GRACE_SECONDS = 10 * 60
+
+_executor = None
+_executor_lock = threading.Lock()
+_eviction_queued = threading.Event()
+
+
+def srcset(image, variants):
+    """``{format: "url 160w, url 320w, ..."}``, empty until the variants of ``image`` exist."""
+    if not image or variants.get("source") != image:
+        return {}
+    sets = {}
+    for file in variants["files"]:
+        sets.setdefault(file["format"], []).append(f"{settings.IMAGE_VARIANTS_URL}{file['name']} {file['width']}w")
+    return {fmt: ", ".join(entries) for fmt, entries in sets.items()}
+
+
+def needs_variants(instance):
+    """Whether ``instance.variants`` were built from another image than the current one."""
+    return instance.variants.get("source", "") != instance.image
+
+
+def downloadable(url):
+    """Only ``IMAGE_VARIANT_HOSTS`` are fetched: the URLs are typed in the admin."""
+    parts = urlsplit(url)
+    return parts.scheme in ("http", "https") and validate_host(parts.hostname or "", settings.IMAGE_VARIANT_HOSTS)
+
+
+def variant_formats():
+    return [fmt for fmt in settings.IMAGE_VARIANT_FORMATS if features.check(fmt)]
+
+
+def download(url):
+    with urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+        data = response.read(MAX_SOURCE_BYTES + 1)
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ValueError(f"{url} is larger than {MAX_SOURCE_BYTES} bytes.")
+    return data
+
+
+def render_variants(data):
+    """Yield ``(format, width, bytes)`` for every variant of an image file's ``data``."""
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+    for width in sorted({min(width, image.width) for width in settings.IMAGE_VARIANT_WIDTHS}):
+        height = max(1, round(image.height * width / image.width))
+        # reducing_gap shrinks by whole factors first, then resamples the small image
+        resized = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for fmt in variant_formats():
+            buffer = io.BytesIO()
+            resized.save(buffer, fmt.upper(), quality=QUALITY.get(fmt, 80))
+            yield fmt, width, buffer.getvalue()
+
+
+def store(content, fmt, width):
+    """Write a variant under its content hash; returns the file name."""
+    name = f"{hashlib.sha256(content).hexdigest()[:20]}-{width}.{fmt}"
+    path = os.path.join(settings.IMAGE_VARIANTS_ROOT, name)
+    if os.path.exists(path):
+        # Shared with another image: restart its grace period
+        os.utime(path)
+        return name
+    os.makedirs(settings.IMAGE_VARIANTS_ROOT, exist_ok=True)
+    partial = f"{path}.{threading.get_ident()}.part"
+    with open(partial, "wb") as file:
+        file.write(content)
+    os.replace(partial, path)
+    return name
+
+
+def generate_variants(model, pk, force=False):
+    """Build and record the variants of one ``model`` row; returns its ``variants`` or None if nothing changed."""
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not (force or needs_variants(instance)):
+        return None
+    previous = instance.variants.get("files")
+    files = []
+    if instance.image and downloadable(instance.image):
+        files = [
+            {"format": fmt, "width": width, "name": store(content, fmt, width)}
+            for fmt, width, content in render_variants(download(instance.image))
+        ]
+    if not files and not previous:
+        return None
+    instance.variants = {"source": instance.image, "files": files} if files else {}
+    # updated_at moves too, so the responses' ETags change with their srcset
+    instance.save(update_fields=["variants", "updated_at"])
+    if previous:
+        schedule_eviction()
+    return instance.variants
+
+
+def evict_variants(grace=EVICTION_GRACE_SECONDS):
+    """Delete the variant files no row lists (and older than ``grace`` seconds); returns how many."""
+    _eviction_queued.clear()
+    listed = {
+        file["name"]
+        for model in IMAGE_MODELS
+        for variants in model.objects.values_list("variants", flat=True).iterator()
+        for file in variants.get("files", ())
+    }
+    try:
+        entries = list(os.scandir(settings.IMAGE_VARIANTS_ROOT))
+    except FileNotFoundError:
+        return 0
+    cutoff = time.time() - grace
+    evicted = 0
+    for entry in entries:
+        if entry.name in listed or not entry.is_file() or entry.stat().st_mtime >= cutoff:
+            continue
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            continue  # evicted by another worker
+        evicted += 1
+    return evicted
+
+
+def _run(function, args):
+    try:
+        function(*args)
+    except Exception:
+        logger.exception("Image variant task %s%r failed", function.__name__, args)
+
+
+def _run_in_worker(function, args):
+    try:
+        _run(function, args)
+    finally:
+        connections.close_all()
+
+
+def submit(function, *args):
+    """Run ``function(*args)`` in the variant pool, or right away when ``IMAGE_VARIANT_WORKERS`` is 0."""
+    global _executor
+    if not settings.IMAGE_VARIANT_WORKERS:
+        _run(function, args)
+        return
+    with _executor_lock:
+        # Created on first use, so each (forked) server worker gets its own threads
+        if _executor is None:
+            _executor = ThreadPoolExecutor(settings.IMAGE_VARIANT_WORKERS, thread_name_prefix="image-variants")
+    _executor.submit(_run_in_worker, function, args)
+
+
+def schedule_eviction():
+    """Queue one ``evict_variants``; deletes arriving before it starts share it."""
+    if not _eviction_queued.is_set():
+        _eviction_queued.set()
+        submit(evict_variants)
@@ -0,0 +1,232 @@
+"""
+Streaming catalog import (see the ``import_catalog`` command).
+
+Rows are read lazily from CSV or JSON Lines and upserted by slug in
+batches. Categories and units are resolved from in-memory name maps, so a
+batch costs a fixed handful of queries whatever its size: read the current
+stock, upsert the products, map slugs to ids, book stock corrections in the
+ledger, add images and refresh the cards. On PostgreSQL the upsert streams
+the batch through ``COPY`` into a temporary table instead of a multi-row
+INSERT. ``image_ids`` lists the new images whose variants the caller queues
+once the import commits.
+"""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Now
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .cards import refresh_product_cards
+from .images import downloadable
+from .models import Category, Product, ProductImage, StockMovement, Unit
+
+TRUE_VALUES = {"1", "true", "yes", "y", "si", "sí"}
+UPSERT_FIELDS = ["name", "description", "price", "is_active", "category", "unit", "updated_at"]
+COPY_COLUMNS = ["name", "slug", "description", "price", "is_active", "category_id", "unit_id"]
+SLUG_LENGTH = Product._meta.get_field("slug").max_length
+MAX_QUANTITY = 2**31 - 1  # the quantity column is an int4 on PostgreSQL
+
+
+class RowError(ValueError):
+    """A row that cannot be imported; carries its line number."""
+
+    def __init__(self, line, message):
+        super().__init__(f"line {line}: {message}")
+
+
+def read_rows(stream, fmt):
+    """Yield ``(line_number, dict)`` from a CSV (with header) or JSON Lines text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise RowError(line_number, f"invalid JSON ({exc.msg})")
+
+
+def _text(row, key):
+    value = row.get(key)
+    return "" if value is None else str(value).strip()
+
+
+def _clean(line, model, field, value, label=None):
+    """Check ``value`` against the model field (length, digits), so the database never refuses it."""
+    try:
+        model._meta.get_field(field).clean(value, None)
+    except ValidationError as exc:
+        raise RowError(line, f"invalid {label or field} {value!r} ({' '.join(exc.messages)})")
+
+
+class CatalogImporter:
+    """Upserts products from parsed rows; call ``import_rows`` inside a transaction."""
+
+    def __init__(self, batch_size=2000, use_copy=None, progress=None):
+        self.batch_size = batch_size
+        self.use_copy = connection.vendor == "postgresql" if use_copy is None else use_copy
+        self.progress = progress
+        self.categories = dict(Category.objects.values_list("name", "pk"))
+        self.units = dict(Unit.objects.values_list("name", "pk"))
+        self.stats = {"rows": 0, "created": 0, "updated": 0, "categories": 0, "units": 0, "images": 0}
+        # New images to build variants for (bulk_create skips the post_save signal)
+        self.image_ids = []
+        self._staging = False
+
+    def import_rows(self, rows):
+        batch = {}
+        for line, row in rows:
+            product = self.parse(line, row)
+            # The last row wins when a slug repeats within a batch
+            batch[product["slug"]] = product
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = {}
+        if batch:
+            self.flush(batch)
+        return self.stats
+
+    def parse(self, line, row):
+        name = _text(row, "name")
+        if not name:
+            raise RowError(line, "name is required")
+        _clean(line, Product, "name", name)
+        try:
+            price = Decimal(_text(row, "price"))
+        except InvalidOperation:
+            price = Decimal(-1)
+        # Decimal also parses NaN and Infinity
+        if not price.is_finite() or price < 0:
+            raise RowError(line, f"invalid price {row.get('price')!r}")
+        _clean(line, Product, "price", price)
+        quantity = _text(row, "quantity")
+        if quantity:
+            try:
+                quantity = int(quantity)
+            except ValueError:
+                quantity = -1
+            if not 0 <= quantity <= MAX_QUANTITY:
+                raise RowError(line, f"invalid quantity {row.get('quantity')!r}")
+        category, unit = _text(row, "category"), _text(row, "unit")
+        if not category or not unit:
+            raise RowError(line, "category and unit are required")
+        _clean(line, Category, "name", category, "category")
+        _clean(line, Unit, "name", unit, "unit")
+        image = _text(row, "image")
+        if image:
+            _clean(line, ProductImage, "image", image)
+        is_active = _text(row, "is_active")
+        return {
+            "name": name,
+            "slug": (_text(row, "slug") or slugify(name))[:SLUG_LENGTH],
+            "description": _text(row, "description"),
+            "price": price,
+            "is_active": is_active.lower() in TRUE_VALUES if is_active else True,
+            "category_id": self.resolve(self.categories, Category, category, "categories"),
+            "unit_id": self.resolve(self.units, Unit, unit, "units"),
+            "quantity": quantity if quantity != "" else None,
+            "image": image,
+        }
+
+    def resolve(self, names, model, name, stat):
+        if name not in names:
+            names[name] = model.objects.create(name=name).pk
+            self.stats[stat] += 1
+        return names[name]
+
+    def flush(self, batch):
+        slugs = list(batch)
+        before = dict(Product.objects.filter(slug__in=slugs).values_list("slug", "quantity"))
+        if self.use_copy:
+            self.copy_upsert(batch.values())
+        else:
+            Product.objects.bulk_create(
+                [
+                    Product(**{column: row[column] for column in COPY_COLUMNS}, quantity=row["quantity"] or 0)
+                    for row in batch.values()
+                ],
+                update_conflicts=True,
+                unique_fields=["slug"],
+                update_fields=UPSERT_FIELDS,
+            )
+        ids = dict(Product.objects.filter(slug__in=slugs).values_list("slug", "pk"))
+
+        # Stock reaches the requested level through the ledger: new products
+        # were inserted with it, existing ones are moved by the difference.
+        movements, deltas = [], {}
+        for slug, row in batch.items():
+            if row["quantity"] is None:
+                continue
+            delta = row["quantity"] - before.get(slug, 0)
+            if delta:
+                movements.append(StockMovement(product_id=ids[slug], delta=delta, kind=StockMovement.CORRECTION))
+                if slug in before:
+                    deltas[ids[slug]] = delta
+        StockMovement.objects.bulk_create(movements)
+        if deltas:
+            delta = Case(*[When(pk=pk, then=Value(d)) for pk, d in deltas.items()], output_field=IntegerField())
+            Product.objects.filter(pk__in=deltas).update(quantity=F("quantity") + delta, updated_at=Now())
+
+        images = {(ids[slug], row["image"]) for slug, row in batch.items() if row["image"]}
+        if images:
+            existing = set(
+                ProductImage.objects.filter(product_id__in={pk for pk, _ in images}).values_list("product_id", "image")
+            )
+            with_images = {pk for pk, _ in existing}
+            created = ProductImage.objects.bulk_create(
+                ProductImage(product_id=pk, image=url, is_primary=pk not in with_images)
+                for pk, url in images - existing
+            )
+            self.stats["images"] += len(created)
+            self.image_ids.extend(image.pk for image in created if downloadable(image.image))
+
+        refresh_product_cards(ids.values())
+        self.stats["rows"] += len(batch)
+        self.stats["created"] += len(batch) - len(before)
+        self.stats["updated"] += len(before)
+        if self.progress:
+            self.progress(self.stats)
+
+    def copy_upsert(self, rows):
+        """PostgreSQL: COPY the batch into a temp table, then one INSERT ... ON CONFLICT."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([*(row[column] for column in COPY_COLUMNS), row["quantity"] or 0])
+        buffer.seek(0)
+
+        table = Product._meta.db_table
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            if not self._staging:
+                # Same column types as the product table, none of its constraints
+                cursor.execute(
+                    "CREATE TEMP TABLE catalog_import_product ON COMMIT DROP AS "
+                    f"SELECT {', '.join(COPY_COLUMNS)}, quantity FROM {table} WITH NO DATA"
+                )
+                self._staging = True
+            cursor.execute("TRUNCATE catalog_import_product")
+            cursor.copy_expert(
+                f"COPY catalog_import_product ({', '.join(COPY_COLUMNS)}, quantity) FROM STDIN "
+                "WITH (FORMAT csv, FORCE_NOT_NULL (description))",
+                buffer,
+            )
+            updates = ", ".join(
+                f"{column} = EXCLUDED.{column}"
+                for column in [*COPY_COLUMNS, "updated_at"] if column != "slug"
+            )
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(COPY_COLUMNS)}, quantity, created_at, updated_at) "
+                f"SELECT {', '.join(COPY_COLUMNS)}, quantity, %s, %s FROM catalog_import_product "
+                f"ON CONFLICT (slug) DO UPDATE SET {updates}",
+                [now, now],
+            )
@@ -0,0 +1,271 @@
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.utils.crypto import get_random_string
+
+from catalog.checks import shared_cache_errors
+from catalog.models import Category, Product
+
+SEARCH_TERMS = ["limon", "aguacate", "mora", "jengibre", "oregano", "platano"]
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the catalog API with a fixed mix of requests and record throughput, latency percentiles and "
+        "queries per request as JSON. Read-only unless --with-orders is given; run it against a seeded "
+        "benchmark database (seed_catalogs --products ...)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=["client", "gunicorn", "asgi"], default="client",
+                            help="In-process Django test client, or HTTP against gunicorn with sync (WSGI) "
+                                 "or uvicorn (ASGI) workers")
+        parser.add_argument("--url", help="Base URL of an already running server (gunicorn and asgi modes)")
+        parser.add_argument("--workers", type=int, default=2, help="Gunicorn workers to start")
+        parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients (gunicorn and asgi modes)")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--with-orders", metavar="USERNAME",
+                            help="Also place orders as this staff user. They are real: they create sales and "
+                                 "take stock in the configured database")
+        parser.add_argument("--output", help="Write the results to this JSON file")
+        parser.add_argument("--compare", help="Baseline JSON to compare against; regressions fail the command")
+        parser.add_argument("--threshold", type=float, default=0.2,
+                            help="Tolerated relative slowdown before a scenario counts as a regression")
+
+    def handle(self, *args, **options):
+        user = None
+        if options["with_orders"]:
+            user = User.objects.filter(username=options["with_orders"], is_staff=True).first()
+            if user is None:
+                raise CommandError(f"No staff user {options['with_orders']!r} to place the orders.")
+        scenarios = self.build_scenarios(random.Random(options["seed"]), with_orders=user is not None)
+        if options["mode"] == "client":
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                results = {
+                    name: self.run_client(build, options["requests"], user) for name, build in scenarios.items()
+                }
+        elif options["url"]:
+            results = self.run_http(options["url"], scenarios, options, user)
+        else:
+            with self.gunicorn(options["workers"], asgi=options["mode"] == "asgi") as url:
+                results = self.run_http(url, scenarios, options, user)
+
+        report = {
+            "meta": {
+                "mode": options["mode"],
+                "concurrency": None if options["mode"] == "client" else options["concurrency"],
+                "commit": self.git_commit(),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "database": settings.DATABASES["default"]["ENGINE"].rsplit(".", 1)[-1],
+                "products": Product.objects.count(),
+                "requests": options["requests"],
+                "orders": user is not None,
+            },
+            "scenarios": results,
+        }
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:18} {stats['throughput_rps']:8.1f} req/s  p50={stats['p50_ms']:7.2f}ms "
+                f"p95={stats['p95_ms']:7.2f}ms p99={stats['p99_ms']:7.2f}ms  "
+                f"queries={stats['queries_max']:3d}  errors={stats['errors']}"
+            )
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+        if options["compare"]:
+            with open(options["compare"]) as fh:
+                baseline = json.load(fh)
+            # In-process timings are not comparable with HTTP ones; WSGI and ASGI runs are
+            if (baseline["meta"]["mode"] == "client") != (options["mode"] == "client"):
+                raise CommandError(f"{options['compare']} was recorded in {baseline['meta']['mode']} mode.")
+            regressions = compare(baseline["scenarios"], results, options["threshold"])
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}.")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}."))
+
+    def build_scenarios(self, rng, with_orders=False):
+        """``{name: build}`` where ``build()`` returns ``(method, path, json_body)`` for the next request."""
+        product_ids = list(Product.objects.filter(is_active=True).values_list("pk", flat=True)[:5000])
+        in_stock = list(
+            Product.objects.filter(is_active=True, quantity__gt=0).values_list("pk", "price")[:5000]
+        )
+        category_slugs = list(Category.objects.filter(is_active=True).values_list("slug", flat=True))
+        if not product_ids or not category_slugs:
+            raise CommandError("No active products to benchmark; run seed_catalogs first.")
+
+        def order():
+            pk, price = rng.choice(in_stock)
+            return "POST", "/api/orders/", {"lines": [{"product": pk, "quantity": 1, "sold_price": str(price)}]}
+
+        scenarios = {
+            "product_list": lambda: ("GET", "/api/products/", None),
+            "product_search": lambda: ("GET", f"/api/products/?search={rng.choice(SEARCH_TERMS)}", None),
+            "product_category": lambda: ("GET", f"/api/products/?category__slug={rng.choice(category_slugs)}", None),
+            "product_in_stock": lambda: ("GET", "/api/products/?in_stock=1", None),
+            "product_detail": lambda: ("GET", f"/api/products/{rng.choice(product_ids)}/", None),
+            "category_list": lambda: ("GET", "/api/categories/", None),
+        }
+        if with_orders and in_stock:
+            scenarios["order_create"] = order
+        return scenarios
+
+    def run_client(self, build, count, user=None):
+        client = Client()
+        # Reads stay anonymous so the session lookups don't count against them
+        order_client = Client()
+        if user is not None:
+            order_client.force_login(user)
+        samples = []
+        start = time.perf_counter()
+        for _ in range(count):
+            method, path, body = build()
+            began = time.perf_counter()
+            if method == "POST":
+                response = order_client.post(path, json.dumps(body), content_type="application/json")
+            else:
+                response = client.get(path)
+            samples.append((time.perf_counter() - began, response.status_code, response.get("Server-Timing", "")))
+        return summarize(samples, time.perf_counter() - start)
+
+    def run_http(self, url, scenarios, options, user=None):
+        url = url.rstrip("/")
+        order_headers = self.session_headers(user) if user is not None else {}
+
+        def fetch(request):
+            method, path, body = request
+            data = json.dumps(body).encode() if body is not None else None
+            headers = {"Content-Type": "application/json", **(order_headers if method == "POST" else {})}
+            req = urllib.request.Request(url + path, data=data, method=method, headers=headers)
+            began = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=30) as response:
+                    response.read()
+                    status, timing = response.status, response.headers.get("Server-Timing", "")
+            except urllib.error.HTTPError as exc:
+                status, timing = exc.code, exc.headers.get("Server-Timing", "")
+            return time.perf_counter() - began, status, timing
+
+        results = {}
+        with ThreadPoolExecutor(options["concurrency"]) as pool:
+            for name, build in scenarios.items():
+                requests = [build() for _ in range(options["requests"])]
+                start = time.perf_counter()
+                samples = list(pool.map(fetch, requests))
+                results[name] = summarize(samples, time.perf_counter() - start)
+        return results
+
+    def session_headers(self, user):
+        """Cookie and CSRF headers of a fresh session for ``user``, stored where the server reads them."""
+        client = Client()
+        client.force_login(user)
+        csrf_token = get_random_string(32)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        return {
+            "Cookie": f"{settings.SESSION_COOKIE_NAME}={session}; {settings.CSRF_COOKIE_NAME}={csrf_token}",
+            "X-CSRFToken": csrf_token,
+        }
+
+    @contextmanager
+    def gunicorn(self, workers, asgi=False):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        # gunicorn.conf.py picks the app and worker class from SERVER_MODE
+        env = {**os.environ, "SERVER_MODE": "asgi" if asgi else "wsgi"}
+        cache_dir = None
+        if shared_cache_errors(workers):
+            # The workers need a shared cache; a file cache will do for a benchmark
+            cache_dir = tempfile.mkdtemp(prefix="benchmark-cache-")
+            env["CACHE_URL"] = f"filecache://{cache_dir}"
+            self.stdout.write(f"Local-memory cache: the workers share a file cache in {cache_dir}")
+        process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}",
+             "--workers", str(workers), "--log-level", "warning"],
+            cwd=settings.BASE_DIR,
+            env=env,
+        )
+        try:
+            url = f"http://127.0.0.1:{port}"
+            self.wait_until_up(url, process)
+            yield url
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+            if cache_dir:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def wait_until_up(self, url, process, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError("gunicorn exited during startup.")
+            try:
+                urllib.request.urlopen(f"{url}/api/categories/", timeout=2).read()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError("gunicorn did not start in time.")
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+    queries = [int(m.group(1)) for _, _, timing in samples if (m := QUERIES.search(timing))]
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, status, _ in samples if status >= 400),
+        "throughput_rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(cuts[49], 2),
+        "p95_ms": round(cuts[94], 2),
+        "p99_ms": round(cuts[98], 2),
+        "queries_mean": round(statistics.fmean(queries), 2) if queries else None,
+        "queries_max": max(queries, default=0),
+    }
+
+
+def compare(baseline, results, threshold):
+    """Describe every scenario that got slower, lost throughput or issues more queries than the baseline."""
+    regressions = []
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if now["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {now['p95_ms']}ms")
+        if now["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {now['throughput_rps']} req/s")
+        if now["queries_max"] > before["queries_max"]:
+            regressions.append(f"{name}: queries per request {before['queries_max']} -> {now['queries_max']}")
+    return regressions
@@ -0,0 +1,54 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from catalog.models import Product
+from catalog.search import search_products
+from catalog.synthetic import generate_products
+
+QUERIES = ["limon", "limón", "aguacte", "mermelada de mora", "oregano", "platano maduro", "jengibre"]
+
+
+class Command(BaseCommand):
+    help = "Compare ILIKE search with the PostgreSQL full-text/trigram search on a synthetic catalog (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100_000, help="Synthetic products to generate")
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per query")
+        parser.add_argument("--limit", type=int, default=24, help="Rows fetched per query (one page)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("The search benchmark needs PostgreSQL.")
+
+        with transaction.atomic():
+            self.stdout.write(f"Generating {options['products']} synthetic products...")
+            generate_products(options["products"])
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE catalog_product")
+
+            base = Product.objects.filter(is_active=True)
+            strategies = {
+                "ilike": lambda text: base.filter(Q(name__icontains=text) | Q(description__icontains=text)).order_by("-updated_at", "-id"),
+                "fulltext": lambda text: search_products(base, text).order_by("-search_rank", "-id"),
+            }
+            for text in QUERIES:
+                for label, build in strategies.items():
+                    timings, hits = self.measure(build, text, options["repeat"], options["limit"])
+                    self.stdout.write(
+                        f"{text!r:22} {label:9} hits={hits:3d} "
+                        f"median={statistics.median(timings):7.2f}ms max={max(timings):7.2f}ms"
+                    )
+
+            transaction.set_rollback(True)
+
+    def measure(self, build, text, repeat, limit):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = list(build(text).values_list("id", flat=True)[:limit])
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings, len(rows)
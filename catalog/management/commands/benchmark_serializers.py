@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.api_serializers import CarouselBannerSerializer, CategorySerializer, ProductListSerializer
+from catalog.cards import primary_image_prefetch
+from catalog.fast_serializers import (
+    FastCarouselBannerSerializer,
+    FastCategorySerializer,
+    FastProductListSerializer,
+)
+from catalog.models import CarouselBanner, Category, Product
+from catalog.synthetic import generate_products
+
+
+class Command(BaseCommand):
+    help = "Compare DRF serializers with catalog.fast_serializers on a synthetic catalog (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=10_000, help="Synthetic products to generate")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per serializer")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            generate_products(options["products"])
+            CarouselBanner.objects.bulk_create(
+                CarouselBanner(title=f"Banner {i}", image=f"https://img.test/{i}.webp", order=i) for i in range(50)
+            )
+
+            products = (
+                Product.objects.filter(is_active=True)
+                .select_related("category", "unit")
+                .prefetch_related(primary_image_prefetch())
+            )
+            cases = [
+                ("products", lambda: ProductListSerializer(products, many=True).data,
+                 lambda: FastProductListSerializer().serialize(Product.objects.filter(is_active=True))),
+                ("categories", lambda: CategorySerializer(Category.objects.all(), many=True).data,
+                 lambda: FastCategorySerializer().serialize(Category.objects.all())),
+                ("carousel", lambda: CarouselBannerSerializer(CarouselBanner.objects.all(), many=True).data,
+                 lambda: FastCarouselBannerSerializer().serialize(CarouselBanner.objects.all())),
+            ]
+            for label, reference, fast in cases:
+                rows, drf_time = self.measure(reference, options["repeat"])
+                _, fast_time = self.measure(fast, options["repeat"])
+                self.stdout.write(
+                    f"{label:11} rows={rows:6d} drf={rows / drf_time:10.0f} rows/s "
+                    f"fast={rows / fast_time:10.0f} rows/s speedup={drf_time / fast_time:5.1f}x"
+                )
+
+            transaction.set_rollback(True)
+
+    def measure(self, render, repeat):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = len(render())
+            best = min(best, time.perf_counter() - start)
+        return rows, best
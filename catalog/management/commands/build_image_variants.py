@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from catalog.images import EVICTION_GRACE_SECONDS, IMAGE_MODELS, evict_variants, generate_variants, needs_variants
+
+
+class Command(BaseCommand):
+    help = "Build missing image variants (WebP/AVIF) and evict the ones no image lists any more"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="Rebuild every image, not just stale ones")
+        parser.add_argument(
+            "--grace", type=int, default=EVICTION_GRACE_SECONDS,
+            help="Keep unlisted files younger than this many seconds",
+        )
+
+    def handle(self, *args, **options):
+        built = failed = 0
+        for model in IMAGE_MODELS:
+            for instance in model.objects.only("pk", "image", "variants").iterator():
+                if not (options["rebuild"] or needs_variants(instance)):
+                    continue
+                try:
+                    built += generate_variants(model, instance.pk, force=options["rebuild"]) is not None
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"{model.__name__} {instance.pk} ({instance.image}): {exc}")
+        evicted = evict_variants(options["grace"])
+        self.stdout.write(self.style.SUCCESS(f"Built variants of {built} images, evicted {evicted} files."))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} images failed, see above."))
@@ -0,0 +1,36 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.exports import EXPORTS, FORMATS, ExportError, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream sales or inventory movements to CSV or Parquet, optionally limited to a date range"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=list(EXPORTS))
+        parser.add_argument("--from", dest="start", type=date.fromisoformat, help="First day (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="end", type=date.fromisoformat, help="Last day, inclusive (YYYY-MM-DD)")
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--output", default="-", help="File to write, - for stdout")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            chunks = stream_export(
+                options["kind"], options["format"], options["start"], options["end"], options["chunk_size"]
+            )
+            if options["output"] == "-":
+                out = sys.stdout.buffer
+                for chunk in chunks:
+                    out.write(chunk)
+                out.flush()
+                return
+            with open(options["output"], "wb") as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+        except ExportError as exc:
+            raise CommandError(exc)
+        self.stderr.write(f"Wrote {options['output']}")
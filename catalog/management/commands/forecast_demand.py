@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.forecast import refresh_forecasts
+
+
+class Command(BaseCommand):
+    help = "Recompute demand forecasts and reorder points for every active product (run daily)"
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = refresh_forecasts()
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecast {count} products in {time.perf_counter() - start:.2f}s."
+        ))
@@ -0,0 +1,66 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from catalog.cache import bump_catalog_version
+from catalog.images import generate_variants, submit
+from catalog.importer import CatalogImporter, RowError, read_rows
+from catalog.models import Category, Product, ProductImage, Unit
+from catalog.suggest import bump_suggest_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert products by slug from a CSV or JSON Lines file (columns: name, price, category, unit and "
+        "optionally slug, description, quantity, is_active, image). Runs in one transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - for stdin")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--no-copy", action="store_true", help="Use bulk INSERT even on PostgreSQL")
+        parser.add_argument("--dry-run", action="store_true", help="Import, report, then roll back")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+        stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8-sig")
+        start = time.perf_counter()
+
+        def progress(stats):
+            if options["verbosity"] >= 1:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"{stats['rows']} rows ({stats['rows'] / elapsed:.0f} rows/s)")
+
+        try:
+            with transaction.atomic():
+                importer = CatalogImporter(
+                    batch_size=options["batch_size"],
+                    use_copy=False if options["no_copy"] else None,
+                    progress=progress,
+                )
+                stats = importer.import_rows(read_rows(stream, fmt))
+                if options["dry_run"]:
+                    transaction.set_rollback(True)
+                else:
+                    # Bulk writes skip the signals that invalidate cached listings and build image variants
+                    for model in (Product, ProductImage, Category, Unit):
+                        transaction.on_commit(lambda model=model: bump_catalog_version(model))
+                    transaction.on_commit(bump_suggest_version)
+                    for pk in importer.image_ids:
+                        transaction.on_commit(lambda pk=pk: submit(generate_variants, ProductImage, pk))
+        except RowError as exc:
+            raise CommandError(f"{path}: {exc}. Nothing was imported.")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Checked' if options['dry_run'] else 'Imported'} {stats['rows']} products "
+            f"({stats['created']} new, {stats['updated']} updated, {stats['images']} images, "
+            f"{stats['categories']} new categories, {stats['units']} new units) "
+            f"in {time.perf_counter() - start:.1f}s."
+        ))
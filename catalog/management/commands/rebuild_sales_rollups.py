@@ -0,0 +1,18 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from catalog.reports import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute SalesDailyRollup rows from the sales (all history, or a date range)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", type=date.fromisoformat, help="First day (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="end", type=date.fromisoformat, help="Last day, inclusive (YYYY-MM-DD)")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        created = rebuild_rollups(options["start"], options["end"], options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {created} rollup rows."))
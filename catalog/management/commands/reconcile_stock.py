@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from catalog.models import Product
+from catalog.stock import find_drift, repair_drift, take_snapshots
+
+
+class Command(BaseCommand):
+    help = "Compare Product.quantity against the stock ledger, optionally repairing drift and taking snapshots"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Reset drifted Product.quantity values to the ledger",
+        )
+        parser.add_argument(
+            "--snapshot",
+            action="store_true",
+            help="Record a new stock snapshot for every product with new movements",
+        )
+
+    def handle(self, *args, **options):
+        drift = find_drift()
+        names = dict(Product.objects.filter(pk__in=[pk for pk, _, _ in drift]).values_list("pk", "name"))
+        for pk, quantity, ledger_quantity in drift:
+            self.stdout.write(f"{names.get(pk, pk)}: quantity={quantity} ledger={ledger_quantity}")
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Stock matches the ledger."))
+        elif options["fix"]:
+            repaired = repair_drift()
+            self.stdout.write(self.style.SUCCESS(f"Repaired {len(repaired)} products."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} products drifted (use --fix to repair)."))
+
+        if options["snapshot"]:
+            count = take_snapshots()
+            self.stdout.write(self.style.SUCCESS(f"Recorded {count} stock snapshots."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from catalog.cards import refresh_product_cards
+from catalog.models import Product
+
+
+class Command(BaseCommand):
+    help = "Re-render every ProductCard (e.g. after bulk updates that bypass signals)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        ids = list(Product.objects.values_list("pk", flat=True))
+        size = options["batch_size"]
+        for start in range(0, len(ids), size):
+            refresh_product_cards(ids[start:start + size])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {len(ids)} product cards."))
@@ -1,5 +1,10 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
+from catalog.cache import bump_catalog_version
 from catalog.models import Category, Product, Inventory, ProductImage, Unit
+from catalog.reports import rebuild_rollups
+from catalog.synthetic import generate_images, generate_products, generate_sales
+from catalog.suggest import bump_suggest_version
 from django.utils.text import slugify
 
 
@@ -12,6 +17,12 @@ class Command(BaseCommand):
             action="store_true",
             help="Delete all products, categories, inventory and images before seeding",
         )
+        # Load-test sizes (10k-1M products); synthetic rows come on top of the real catalog
+        parser.add_argument("--products", type=int, default=0, help="Synthetic products to add")
+        parser.add_argument("--images", type=int, default=0, help="Images per synthetic product")
+        parser.add_argument("--sales", type=int, default=0, help="Historic sales to add")
+        parser.add_argument("--days", type=int, default=90, help="Days the synthetic sales are spread over")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic data")
 
     def handle(self, *args, **options):
         if options["flush"]:
@@ -92,7 +103,7 @@ class Command(BaseCommand):
             ("Zacate limon", "4 onz", 5, 30, "Hierbas"),
         ]
 
-        for idx, (name, unidad, dispo, precio, cat_name) in enumerate(products_data, start=1):
+        for name, unidad, dispo, precio, cat_name in products_data:
             category = categories[cat_name]
             # ensure Unit exists or get it
             unit_obj, _ = Unit.objects.get_or_create(name=unidad)
@@ -108,12 +119,30 @@ class Command(BaseCommand):
                     "is_active": True,
                 },
             )
+            # SKUs come from the inventory sequence when the movement is created
             Inventory.objects.update_or_create(
                 product=product,
-                defaults={
-                    "sku": f"P{idx:03d}",
-                    "quantity": dispo,
-                },
+                defaults={"quantity": dispo},
             )
 
-        self.stdout.write(self.style.SUCCESS("✅ ECOLO SUR products seeded successfully!"))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS("✅ ECOLO SUR products seeded successfully!"))
+
+        if options["products"] or options["images"] or options["sales"]:
+            self.seed_synthetic(options)
+
+    def seed_synthetic(self, options):
+        if options["products"]:
+            created = generate_products(options["products"], seed=options["seed"])
+            self.stdout.write(f"Added {created} synthetic products.")
+        if options["images"]:
+            created = generate_images(options["images"])
+            self.stdout.write(f"Added {created} synthetic product images.")
+        if options["sales"]:
+            created = generate_sales(options["sales"], days=options["days"], seed=options["seed"])
+            self.stdout.write(f"Added {created} synthetic sales.")
+            rebuild_rollups()
+        # Bulk inserts skip the signals: rebuild the cards and drop cached listings
+        call_command("refresh_product_cards", stdout=self.stdout)
+        bump_catalog_version(Product)
+        bump_catalog_version(ProductImage)
+        bump_suggest_version()
@@ -0,0 +1,16 @@
+"""Catalog business metrics, exported through ``/metrics`` (see utils.metrics)."""
+from prometheus_client import Counter
+
+CACHE_LOOKUPS = Counter(
+    "catalog_response_cache_total", "Catalog response cache lookups by result (hit/miss).", ["viewset", "result"]
+)
+SALES = Counter("catalog_sales_total", "Sale rows booked.")
+SALE_UNITS = Counter("catalog_sale_units_total", "Units sold.")
+STOCK_OUTS = Counter(
+    "catalog_stock_outs_total", "Sales or orders refused because a product was out of stock (at validation or in a race).", ["source"]
+)
+
+
+def record_sales(sales):
+    SALES.inc(len(sales))
+    SALE_UNITS.inc(sum(sale.quantity for sale in sales))
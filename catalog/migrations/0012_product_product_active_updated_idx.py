@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-17 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_remove_inventory_updated_at_product_quantity_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'updated_at', 'id'], name='product_active_updated_idx'),
+        ),
+    ]
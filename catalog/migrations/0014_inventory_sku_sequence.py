@@ -0,0 +1,46 @@
+import re
+
+from django.db import migrations
+
+SKU_SEQUENCE = "inventory_sku"
+SKU_PATTERN = re.compile(r"^P(\d+)$")
+
+
+def seed_sku_sequence(apps, schema_editor):
+    """
+    Start the SKU sequence after the highest numeric SKU (compared as a number,
+    so P1000 beats P999) and give malformed or blank SKUs fresh numbers.
+    """
+    Inventory = apps.get_model("catalog", "Inventory")
+    Sequence = apps.get_model("catalog", "Sequence")
+
+    last_value = 0
+    broken = []
+    for item in Inventory.objects.order_by("created_at", "id"):
+        match = SKU_PATTERN.match(item.sku or "")
+        if match:
+            last_value = max(last_value, int(match.group(1)))
+        else:
+            broken.append(item)
+
+    for item in broken:
+        last_value += 1
+        item.sku = f"P{last_value:03d}"
+    Inventory.objects.bulk_update(broken, ["sku"])
+
+    Sequence.objects.update_or_create(name=SKU_SEQUENCE, defaults={"last_value": last_value})
+
+
+def drop_sku_sequence(apps, schema_editor):
+    apps.get_model("catalog", "Sequence").objects.filter(name=SKU_SEQUENCE).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_sku_sequence, drop_sku_sequence),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.24 on 2026-10-17 23:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def open_ledger(apps, schema_editor):
+    """Start the ledger from today's Product.quantity with one snapshot per product."""
+    Product = apps.get_model("catalog", "Product")
+    StockSnapshot = apps.get_model("catalog", "StockSnapshot")
+    StockSnapshot.objects.bulk_create(
+        StockSnapshot(product_id=pk, quantity=quantity, last_movement_id=0)
+        for pk, quantity in Product.objects.values_list("pk", "quantity").iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_inventory_sku_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='catalog.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-last_movement_id'], name='stocksnapshot_latest_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('kind', models.CharField(choices=[('restock', 'Restock'), ('sale', 'Sale'), ('correction', 'Correction')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('inventory', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movement', to='catalog.inventory')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='catalog.product')),
+                ('sale', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movement', to='catalog.sale')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'id'], name='stockmovement_product_id_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations
+
+# unaccent() is only STABLE, so wrap it to be usable in index expressions
+FORWARD_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION catalog_unaccent(text) RETURNS text AS $$
+        SELECT public.unaccent('public.unaccent', $1)
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    """
+    CREATE OR REPLACE FUNCTION catalog_product_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('spanish', catalog_unaccent(coalesce(NEW.name, ''))), 'A') ||
+            setweight(to_tsvector('spanish', catalog_unaccent(coalesce(NEW.description, ''))), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER catalog_product_search_vector_update
+    BEFORE INSERT OR UPDATE OF name, description ON catalog_product
+    FOR EACH ROW EXECUTE FUNCTION catalog_product_search_vector()
+    """,
+    "UPDATE catalog_product SET name = name",
+    "CREATE INDEX catalog_product_search_vector_idx ON catalog_product USING gin (search_vector)",
+    """
+    CREATE INDEX catalog_product_name_trgm_idx ON catalog_product
+    USING gin (catalog_unaccent(lower(name)) gin_trgm_ops)
+    """,
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS catalog_product_name_trgm_idx",
+    "DROP INDEX IF EXISTS catalog_product_search_vector_idx",
+    "DROP TRIGGER IF EXISTS catalog_product_search_vector_update ON catalog_product",
+    "DROP FUNCTION IF EXISTS catalog_product_search_vector()",
+    "DROP FUNCTION IF EXISTS catalog_unaccent(text)",
+]
+
+
+def run_on_postgres(statements):
+    def run(apps, schema_editor):
+        # Other backends (SQLite in tests) fall back to the plain SearchFilter
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_stock_ledger'),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(run_on_postgres(FORWARD_SQL), run_on_postgres(REVERSE_SQL)),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.24 on 2026-10-17 23:35
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    Sale = apps.get_model("catalog", "Sale")
+    SalesDailyRollup = apps.get_model("catalog", "SalesDailyRollup")
+    rows = (
+        Sale.objects.annotate(day=TruncDate("created_at"))
+        .values("day", "product_id", "product__category_id")
+        .annotate(
+            units=Sum("quantity"),
+            revenue=Sum(F("quantity") * F("sold_price"), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            transactions=Count("id"),
+        )
+        .order_by()
+    )
+    SalesDailyRollup.objects.bulk_create(
+        (
+            SalesDailyRollup(
+                date=row["day"],
+                product_id=row["product_id"],
+                category_id=row["product__category_id"],
+                units=row["units"],
+                revenue=row["revenue"],
+                transactions=row["transactions"],
+            )
+            for row in rows.iterator(chunk_size=5000)
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0018_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transactions', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='catalog.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='catalog.product')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='salesdailyrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'product', 'category'), name='sales_rollup_key'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.24 on 2026-10-17 23:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0019_salesdailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductForecast',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='forecast', serialize=False, to='catalog.product')),
+                ('quantity', models.IntegerField(help_text='Stock when the forecast was computed')),
+                ('moving_average', models.FloatField(help_text='Units per day, recent window')),
+                ('smoothed_demand', models.FloatField(help_text='Units per day, exponential smoothing (the forecast)')),
+                ('demand_std', models.FloatField(help_text='Standard deviation of daily units')),
+                ('days_of_cover', models.FloatField(blank=True, help_text='Empty when nothing is selling', null=True)),
+                ('reorder_point', models.PositiveIntegerField()),
+                ('needs_restock', models.BooleanField(default=False)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['needs_restock', 'days_of_cover'], name='forecast_restock_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.24 on 2026-10-18 00:00
+
+from django.db import migrations, models
+
+
+def drop_product_cards(apps, schema_editor):
+    # Card payloads gain primary_image.srcset; cards are re-rendered when next listed
+    apps.get_model("catalog", "ProductCard").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0020_productforecast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carouselbanner',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(drop_product_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.24 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_sale_category(apps, schema_editor):
+    # Existing history keeps the category its products have now, as the rollups did
+    Sale = apps.get_model("catalog", "Sale")
+    Product = apps.get_model("catalog", "Product")
+    Sale.objects.filter(category__isnull=True).update(
+        category_id=Subquery(Product.objects.filter(pk=OuterRef("product_id")).values("category_id")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0021_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='category',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='catalog.category'),
+        ),
+        migrations.RunPython(backfill_sale_category, migrations.RunPython.noop),
+    ]
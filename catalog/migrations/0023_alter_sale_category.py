@@ -0,0 +1,20 @@
+# Generated by Django 4.2.24 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # Separate from 0022: PostgreSQL won't alter a table with pending trigger events from its backfill
+
+    dependencies = [
+        ('catalog', '0022_sale_category'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sale',
+            name='category',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='catalog.category'),
+        ),
+    ]
@@ -1,7 +1,20 @@
-from django.db import models
+from decimal import Decimal
+
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Max, Min, Q, Value, When, Window
+from django.db.models.functions import Now, RowNumber
+from django.utils import timezone
 from django.utils.text import slugify
 from django.core.exceptions import ValidationError
 
+from .cache import bump_catalog_version
+from .metrics import STOCK_OUTS, record_sales
+
+
+class OutOfStock(ValidationError):
+    """Raised when a sale asks for more units than the product has left."""
+
 class BusinessSettings(models.Model):
     name = models.CharField(max_length=255, default="Ecolo-Sur Market 🌱")
     whatsapp_number = models.CharField(
@@ -39,11 +52,28 @@ class Category(TimeStampedModel):
         help_text="Emoji or short text icon for frontend display"
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["name"], condition=Q(is_active=True), name="category_active_name_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
 
+    @classmethod
+    def with_product_stats(cls, categories=None):
+        """Annotate active product count, in-stock count and price range in one grouped query."""
+        categories = cls.objects.all() if categories is None else categories
+        active = Q(products__is_active=True)
+        return categories.annotate(
+            product_count=Count("products", filter=active),
+            in_stock_count=Count("products", filter=active & Q(products__quantity__gt=0)),
+            min_price=Min("products__price", filter=active),
+            max_price=Max("products__price", filter=active),
+        )
+
     def __str__(self):
         return self.name
 
@@ -69,10 +99,35 @@ class Product(TimeStampedModel):
 
     quantity = models.PositiveIntegerField(default=0)
 
+    # Maintained by a database trigger on PostgreSQL (see migration 0016), unused elsewhere
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the storefront list: WHERE is_active ORDER BY -updated_at, -id
+            models.Index(fields=["-updated_at", "-id"], condition=Q(is_active=True), name="product_active_recent_idx"),
+            # ?in_stock=1
+            models.Index(
+                fields=["-updated_at", "-id"],
+                condition=Q(is_active=True, quantity__gt=0),
+                name="product_in_stock_recent_idx",
+            ),
+            # ?category__slug=... and the per-category aggregates
+            models.Index(
+                fields=["category", "-updated_at", "-id"],
+                condition=Q(is_active=True),
+                name="product_category_recent_idx",
+            ),
+        ]
+
     def save(self, *args, **kwargs):
+        is_new = self._state.adding
         if not self.slug:
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
+        # Opening stock goes through the ledger like any other movement
+        if is_new and self.quantity:
+            StockMovement.objects.create(product=self, delta=self.quantity, kind=StockMovement.CORRECTION)
 
     def __str__(self):
         return f"{self.name} ({self.unit})"
@@ -87,37 +142,103 @@ class ProductImage(TimeStampedModel):
         help_text="front / back / side / etc."
     )
     is_primary = models.BooleanField(default=False)
+    # Resized copies of ``image``, written by catalog.images
+    variants = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         ordering = ["-is_primary", "id"]
+        indexes = [
+            # Primary image lookup: per product, primary first, then oldest
+            models.Index(fields=["product", "-is_primary", "id"], name="productimage_primary_idx"),
+        ]
+
+    @classmethod
+    def primary_per_product(cls, images=None):
+        """One image per product: the primary one, else the first uploaded."""
+        images = cls.objects.all() if images is None else images
+        return images.annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=[F("product_id")],
+                order_by=[F("is_primary").desc(), F("id").asc()],
+            )
+        ).filter(row_number=1)
 
     def __str__(self):
         return f"{self.product.name} ({self.tag or 'image'})"
 
 
+class Sequence(models.Model):
+    """Named counter row; allocating from it is a single locked UPDATE."""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def reserve(cls, name, count=1):
+        """Reserve ``count`` consecutive values and return them as a range."""
+        with transaction.atomic():
+            updated = cls.objects.filter(name=name).update(last_value=F("last_value") + count)
+            if not updated:
+                cls.objects.get_or_create(name=name)
+                cls.objects.filter(name=name).update(last_value=F("last_value") + count)
+            last = cls.objects.filter(name=name).values_list("last_value", flat=True).get()
+        return range(last - count + 1, last + 1)
+
+    def __str__(self):
+        return f"{self.name} = {self.last_value}"
+
+
+class ProductCard(models.Model):
+    """
+    Pre-rendered list payload for a product (``ProductListSerializer`` output
+    minus the stock fields, which are read live from ``Product.quantity``).
+    Refreshed by the catalog signals; see ``catalog.cards``.
+    """
+    product = models.OneToOneField(Product, primary_key=True, on_delete=models.CASCADE, related_name="card")
+    payload = models.JSONField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Card for {self.product_id}"
+
+
 class Inventory(models.Model):
+    SKU_SEQUENCE = "inventory_sku"
+
     sku = models.CharField(max_length=10, unique=True, blank=True)
     product = models.ForeignKey("Product", on_delete=models.CASCADE, related_name="inventory_movements")
     quantity = models.IntegerField(default=0)  # positive for restock, could allow negative for adjustment
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @staticmethod
+    def format_sku(number):
+        return f"P{number:03d}"
+
+    @classmethod
+    def reserve_skus(cls, count):
+        """Reserve a block of SKUs up front, e.g. for bulk imports."""
+        return [cls.format_sku(n) for n in Sequence.reserve(cls.SKU_SEQUENCE, count)]
+
     def save(self, *args, **kwargs):
         is_new = self._state.adding  # detect if this is a new movement
         if not self.sku:
-            last_item = Inventory.objects.order_by('-sku').first()
-            if last_item and last_item.sku.startswith("P"):
-                last_number = int(last_item.sku[1:])
-                new_number = last_number + 1
-            else:
-                new_number = 0
-            self.sku = f"P{new_number:03d}"
-
-        super().save(*args, **kwargs)
-
-        # Only adjust product stock when this is a new record
-        if is_new:
-            self.product.quantity += self.quantity
-            self.product.save()
+            self.sku = self.reserve_skus(1)[0]
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            # Only adjust product stock when this is a new record
+            if is_new:
+                StockMovement.objects.create(
+                    product_id=self.product_id,
+                    delta=self.quantity,
+                    kind=StockMovement.RESTOCK,
+                    inventory=self,
+                )
+                Product.objects.filter(pk=self.product_id).update(
+                    quantity=F("quantity") + self.quantity, updated_at=Now()
+                )
+                transaction.on_commit(lambda: bump_catalog_version(Product))
 
 class CarouselBanner(models.Model):
     title = models.CharField(max_length=150, blank=True, null=True)
@@ -126,23 +247,35 @@ class CarouselBanner(models.Model):
     link = models.URLField(blank=True, null=True, help_text="Optional link when clicking the banner")
     order = models.PositiveIntegerField(default=0, help_text="Sorting order in carousel")
     is_active = models.BooleanField(default=True)
+    # Resized copies of ``image``, written by catalog.images
+    variants = models.JSONField(default=dict, blank=True, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['order', '-created_at']
+        indexes = [
+            models.Index(fields=["order"], condition=Q(is_active=True), name="banner_active_order_idx"),
+        ]
 
     def __str__(self):
         return self.title if self.title else f"Banner {self.id}"
 
 class Sale(models.Model):
     product = models.ForeignKey("Product", on_delete=models.CASCADE, related_name="sales")
+    # The product's category when it was sold (see SalesDailyRollup); set on save
+    category = models.ForeignKey("Category", on_delete=models.CASCADE, related_name="sales", editable=False)
     quantity = models.PositiveIntegerField(default=1)
     sold_price = models.DecimalField(max_digits=10, decimal_places=2)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at"], name="sale_created_idx"),
+        ]
+
     def clean(self):
         if self.quantity > self.product.quantity:
             raise ValidationError(
@@ -150,10 +283,211 @@ class Sale(models.Model):
             )
 
     def save(self, *args, **kwargs):
-        self.clean()
-        self.product.quantity -= self.quantity
-        self.product.save()
-        super().save(*args, **kwargs)
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        if self.category_id is None:
+            self.category_id = self.product.category_id
+
+        with transaction.atomic():
+            # Conditional UPDATE: only succeeds while enough stock is left, so
+            # concurrent checkouts can never take quantity below zero.
+            updated = Product.objects.filter(
+                pk=self.product_id, quantity__gte=self.quantity
+            ).update(quantity=F("quantity") - self.quantity, updated_at=Now())
+            if not updated:
+                left = Product.objects.filter(pk=self.product_id).values_list("quantity", flat=True).first()
+                STOCK_OUTS.labels("sale").inc()
+                raise OutOfStock(f"Not enough stock: only {left or 0} left.")
+            super().save(*args, **kwargs)
+            StockMovement.objects.create(
+                product_id=self.product_id, delta=-self.quantity, kind=StockMovement.SALE, sale=self
+            )
+            SalesDailyRollup.add_sales([self])
+            # .update() skips post_save, so invalidate cached listings ourselves
+            transaction.on_commit(lambda: bump_catalog_version(Product))
+            transaction.on_commit(lambda: record_sales([self]))
+
+    @classmethod
+    def book(cls, lines):
+        """
+        Book a basket of ``(product, quantity, sold_price)`` lines atomically.
+
+        Stock for every product is taken with one conditional UPDATE and the
+        sales are bulk-inserted; if any product is short nothing is booked.
+        """
+        lines = list(lines)
+        products, wanted = {}, {}
+        for product, quantity, _ in lines:
+            products[product.pk] = product
+            wanted[product.pk] = wanted.get(product.pk, 0) + quantity
+        per_product = Case(
+            *[When(pk=pk, then=Value(quantity)) for pk, quantity in wanted.items()],
+            output_field=IntegerField(),
+        )
+
+        try:
+            with transaction.atomic():
+                updated = Product.objects.filter(
+                    pk__in=wanted, quantity__gte=per_product
+                ).update(quantity=F("quantity") - per_product, updated_at=Now())
+                if updated != len(wanted):
+                    raise OutOfStock("Not enough stock.")
+                sales = cls.objects.bulk_create(
+                    cls(product=product, category_id=product.category_id, quantity=quantity, sold_price=sold_price)
+                    for product, quantity, sold_price in lines
+                )
+                StockMovement.objects.bulk_create(
+                    StockMovement(product_id=sale.product_id, delta=-sale.quantity, kind=StockMovement.SALE, sale=sale)
+                    for sale in sales
+                )
+                SalesDailyRollup.add_sales(sales)
+                transaction.on_commit(lambda: bump_catalog_version(Product))
+                transaction.on_commit(lambda: record_sales(sales))
+        except OutOfStock:
+            STOCK_OUTS.labels("order").inc()
+            left = dict(Product.objects.filter(pk__in=wanted).values_list("pk", "quantity"))
+            short = ", ".join(
+                f"{products[pk].name} (only {left.get(pk, 0)} left)"
+                for pk, quantity in wanted.items()
+                if left.get(pk, 0) < quantity
+            )
+            raise OutOfStock(f"Not enough stock: {short}." if short else "Not enough stock.")
+        return sales
+
+    def __str__(self):
+        return f"Sale of {self.quantity} x {self.product.name} at {self.sold_price}"
+
+
+class StockMovement(models.Model):
+    """
+    Append-only stock ledger. Every restock, sale and correction adds a row;
+    rows are never updated, so ``Product.quantity`` can always be rebuilt.
+    """
+    RESTOCK = "restock"
+    SALE = "sale"
+    CORRECTION = "correction"
+    KIND_CHOICES = [
+        (RESTOCK, "Restock"),
+        (SALE, "Sale"),
+        (CORRECTION, "Correction"),
+    ]
+
+    product = models.ForeignKey("Product", on_delete=models.CASCADE, related_name="stock_movements")
+    delta = models.IntegerField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    inventory = models.OneToOneField(
+        "Inventory", on_delete=models.SET_NULL, null=True, blank=True, related_name="stock_movement"
+    )
+    sale = models.OneToOneField(
+        "Sale", on_delete=models.SET_NULL, null=True, blank=True, related_name="stock_movement"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "id"], name="stockmovement_product_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.delta:+d} ({self.kind})"
+
+
+class StockSnapshot(models.Model):
+    """Stock of a product after every ledger row up to ``last_movement_id``."""
+    product = models.ForeignKey("Product", on_delete=models.CASCADE, related_name="stock_snapshots")
+    quantity = models.IntegerField()
+    last_movement_id = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "-last_movement_id"], name="stocksnapshot_latest_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.quantity} @ {self.last_movement_id}"
+
+
+class SalesDailyRollup(models.Model):
+    """
+    Units, revenue and number of sales per day, product and category.
+
+    Kept up to date as sales are booked (see ``add_sales``); edited or
+    deleted sales are not replayed, ``rebuild_sales_rollups`` recomputes a
+    date range from the ``Sale`` rows.
+
+    Sales count under the category their product had when it was sold
+    (``Sale.category``), in both paths: moving a product to another category
+    leaves its history where it was.
+    """
+    date = models.DateField()
+    product = models.ForeignKey("Product", on_delete=models.CASCADE, related_name="daily_sales")
+    category = models.ForeignKey("Category", on_delete=models.CASCADE, related_name="daily_sales")
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transactions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "product", "category"], name="sales_rollup_key"),
+        ]
+
+    @classmethod
+    def add_sales(cls, sales):
+        """Fold new sales into their rows: one INSERT and one UPDATE however many sales."""
+        totals = {}
+        for sale in sales:
+            key = (timezone.localdate(sale.created_at), sale.product_id, sale.category_id)
+            units, revenue, count = totals.get(key, (0, Decimal(0), 0))
+            totals[key] = (units + sale.quantity, revenue + sale.quantity * Decimal(sale.sold_price), count + 1)
+        if not totals:
+            return
+
+        # Create missing rows empty, then increment every row in place, so
+        # concurrent bookings for the same day never overwrite each other.
+        cls.objects.bulk_create(
+            [cls(date=day, product_id=product, category_id=category) for day, product, category in totals],
+            ignore_conflicts=True,
+        )
+
+        def increment(index, output_field):
+            return Case(
+                *[
+                    When(date=day, product_id=product, category_id=category, then=Value(values[index]))
+                    for (day, product, category), values in totals.items()
+                ],
+                output_field=output_field,
+            )
+
+        rows = Q()
+        for day, product, category in totals:
+            rows |= Q(date=day, product_id=product, category_id=category)
+        cls.objects.filter(rows).update(
+            units=F("units") + increment(0, IntegerField()),
+            revenue=F("revenue") + increment(1, DecimalField(max_digits=14, decimal_places=2)),
+            transactions=F("transactions") + increment(2, IntegerField()),
+        )
+
+    def __str__(self):
+        return f"{self.date} {self.product_id}: {self.units} units, {self.revenue}"
+
+
+class ProductForecast(models.Model):
+    """Latest demand forecast of a product; rewritten by ``forecast_demand`` (see catalog.forecast)."""
+    product = models.OneToOneField("Product", on_delete=models.CASCADE, primary_key=True, related_name="forecast")
+    quantity = models.IntegerField(help_text="Stock when the forecast was computed")
+    moving_average = models.FloatField(help_text="Units per day, recent window")
+    smoothed_demand = models.FloatField(help_text="Units per day, exponential smoothing (the forecast)")
+    demand_std = models.FloatField(help_text="Standard deviation of daily units")
+    days_of_cover = models.FloatField(null=True, blank=True, help_text="Empty when nothing is selling")
+    reorder_point = models.PositiveIntegerField()
+    needs_restock = models.BooleanField(default=False)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["needs_restock", "days_of_cover"], name="forecast_restock_idx"),
+        ]
 
     def __str__(self):
-        return f"Sale of {self.quantity} x {self.product.name} at {self.sold_price}"
\ No newline at end of file
+        return f"{self.product_id}: {self.smoothed_demand:.2f}/day, reorder at {self.reorder_point}"
@@ -0,0 +1,16 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class ProductCursorPagination(CursorPagination):
+    """Keyset pagination so deep pages never pay for an OFFSET scan."""
+    ordering = ("-updated_at", "-id")
+    page_size = settings.PRODUCTS_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.PRODUCTS_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        # Ranked search results page by relevance instead of recency
+        if "search_rank" in queryset.query.annotations:
+            return ("-search_rank", "-id")
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,84 @@
+"""
+JSON encoding for the API: orjson when it is installed, the stdlib otherwise.
+
+Decimals are encoded as strings (matching DRF's ``COERCE_DECIMAL_TO_STRING``
+output for ``price``/``sold_price``) and datetimes as ISO 8601.
+"""
+import decimal
+import json
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+_drf_encoder = encoders.JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    return _drf_encoder.default(obj)
+
+
+class _StdlibEncoder(encoders.JSONEncoder):
+    def default(self, obj):
+        return _default(obj)
+
+
+def dumps(data):
+    """Compact UTF-8 JSON bytes for ``data``."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+    return json.dumps(data, cls=_StdlibEncoder, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` encoding with ``dumps``; indented output (browsable API) keeps the stdlib path."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+def stream_json_array(batches):
+    """Yield a JSON array chunk by chunk from an iterable of row lists."""
+    yield b"["
+    first = True
+    for rows in batches:
+        if not rows:
+            continue
+        chunk = b",".join(dumps(row) for row in rows)
+        yield chunk if first else b"," + chunk
+        first = False
+    yield b"]"
+
+
+class StreamingListMixin:
+    """
+    Streams unpaginated JSON ``list`` responses: rows are read with
+    ``.iterator()`` and serialized/encoded ``stream_chunk_size`` at a time, so
+    memory stays flat however many rows there are. Other formats (e.g. the
+    browsable API) take the regular path.
+    """
+    stream_chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None or not isinstance(request.accepted_renderer, JSONRenderer):
+            return super().list(request, *args, **kwargs)
+
+        rows = self.filter_queryset(self.get_queryset()).iterator(chunk_size=self.stream_chunk_size)
+
+        def batches():
+            while batch := list(islice(rows, self.stream_chunk_size)):
+                yield self.get_serializer(batch, many=True).data
+
+        return StreamingHttpResponse(stream_json_array(batches()), content_type="application/json")
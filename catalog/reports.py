@@ -0,0 +1,85 @@
+"""
+Sales reporting on top of ``SalesDailyRollup``.
+
+Reports read the rollup table only, so their cost depends on the number of
+days, products and categories in the range rather than on the number of
+sales. ``rebuild_rollups`` recomputes rollup rows from the ``Sale`` table.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate, TruncDay, TruncMonth, TruncWeek
+
+from .exports import date_range
+from .models import Sale, SalesDailyRollup
+
+GRANULARITIES = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}
+# group_by -> (fields, named expressions) added to every row
+GROUP_BY = {
+    "none": ([], {}),
+    "product": (["product_id"], {"product_name": F("product__name")}),
+    "category": (["category_id"], {"category_name": F("category__name")}),
+}
+CENTS = Decimal("0.01")
+
+
+def rebuild_rollups(start=None, end=None, batch_size=5000):
+    """Replace the rollup rows between ``start`` and ``end`` (dates, inclusive) from the sales."""
+    since, until = date_range(start, end)
+    sales = Sale.objects.all()
+    rollups = SalesDailyRollup.objects.all()
+    if since:
+        sales = sales.filter(created_at__gte=since)
+        rollups = rollups.filter(date__gte=start)
+    if until:
+        sales = sales.filter(created_at__lt=until)
+        rollups = rollups.filter(date__lte=end)
+
+    rows = (
+        sales.annotate(day=TruncDate("created_at"))
+        .values("day", "product_id", "category_id")
+        .annotate(
+            total_units=Sum("quantity"),
+            total_revenue=Sum(F("quantity") * F("sold_price"), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            count=Count("id"),
+        )
+        .order_by()
+        .iterator(chunk_size=batch_size)
+    )
+    created, batch = 0, []
+    with transaction.atomic():
+        rollups.delete()
+        for row in rows:
+            batch.append(SalesDailyRollup(
+                date=row["day"],
+                product_id=row["product_id"],
+                category_id=row["category_id"],
+                units=row["total_units"],
+                revenue=row["total_revenue"],
+                transactions=row["count"],
+            ))
+            if len(batch) >= batch_size:
+                created += len(SalesDailyRollup.objects.bulk_create(batch))
+                batch = []
+        created += len(SalesDailyRollup.objects.bulk_create(batch))
+    return created
+
+
+def sales_report(start=None, end=None, granularity="day", group_by="none"):
+    """Totals per period (and product or category), oldest period first."""
+    rollups = SalesDailyRollup.objects.all()
+    if start:
+        rollups = rollups.filter(date__gte=start)
+    if end:
+        rollups = rollups.filter(date__lte=end)
+    fields, names = GROUP_BY[group_by]
+    rows = (
+        rollups.annotate(period=GRANULARITIES[granularity]("date"))
+        .values("period", *fields, **names)
+        .annotate(units=Sum("units"), revenue=Sum("revenue"), transactions=Sum("transactions"))
+        .order_by("period", *fields)
+    )
+    for row in rows:
+        row["revenue"] = row["revenue"].quantize(CENTS)
+        yield row
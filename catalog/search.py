@@ -0,0 +1,40 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connections
+from django.db.models import F, Func, Q, Value
+from django.db.models.functions import Lower
+from rest_framework.filters import SearchFilter
+
+
+class Unaccent(Func):
+    """The IMMUTABLE ``unaccent`` wrapper created in migration 0016."""
+    function = "catalog_unaccent"
+
+
+def search_products(queryset, text):
+    """
+    Ranked PostgreSQL search: Spanish full-text over name/description plus
+    trigram similarity on the name, so "limon" finds "Limón" and "aguacte"
+    still finds "Aguacate". Adds a ``search_rank`` annotation.
+    """
+    query = SearchQuery(Unaccent(Value(text)), config="spanish", search_type="websearch")
+    normalized = Unaccent(Lower(Value(text)))
+    return (
+        queryset.annotate(normalized_name=Unaccent(Lower("name")))
+        .filter(Q(search_vector=query) | Q(normalized_name__trigram_similar=normalized))
+        .annotate(
+            search_rank=SearchRank(F("search_vector"), query)
+            + TrigramSimilarity("normalized_name", normalized)
+        )
+    )
+
+
+class ProductSearchFilter(SearchFilter):
+    """``?search=`` backed by ``search_products`` on PostgreSQL, ILIKE elsewhere."""
+
+    def filter_queryset(self, request, queryset, view):
+        if connections[queryset.db].vendor != "postgresql":
+            return super().filter_queryset(request, queryset, view)
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search_products(queryset, " ".join(terms))
@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .cache import bump_catalog_version
+from .cards import refresh_product_cards
+from .images import IMAGE_MODELS, downloadable, generate_variants, needs_variants, schedule_eviction, submit
+from .models import BusinessSettings, CarouselBanner, Category, Product, ProductImage, Unit
+from .suggest import SUGGEST_MODELS, bump_suggest_version, invalidate_index, touches_suggestions
+
+CATALOG_MODELS = (Product, ProductImage, Category, Unit, CarouselBanner, BusinessSettings)
+
+# Everything runs after commit: the rows are final and cascades have finished.
+# Card receivers are connected first so cards are fresh before versions move on.
+
+
+def refresh_cards_later(product_ids):
+    transaction.on_commit(lambda: refresh_product_cards(product_ids))
+
+
+def refresh_product_card(sender, instance, **kwargs):
+    refresh_cards_later([instance.pk])
+
+
+def refresh_image_product_card(sender, instance, **kwargs):
+    refresh_cards_later([instance.product_id])
+
+
+def refresh_related_product_cards(sender, instance, **kwargs):
+    field = "category" if sender is Category else "unit"
+    refresh_cards_later(list(Product.objects.filter(**{field: instance}).values_list("pk", flat=True)))
+
+
+post_save.connect(refresh_product_card, sender=Product)
+post_save.connect(refresh_image_product_card, sender=ProductImage)
+post_delete.connect(refresh_image_product_card, sender=ProductImage)
+post_save.connect(refresh_related_product_cards, sender=Category)
+post_save.connect(refresh_related_product_cards, sender=Unit)
+
+
+def invalidate_catalog_cache(sender, **kwargs):
+    transaction.on_commit(lambda: bump_catalog_version(sender))
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(invalidate_catalog_cache, sender=model)
+    post_delete.connect(invalidate_catalog_cache, sender=model)
+
+
+def check_suggestions(sender, instance, update_fields=None, **kwargs):
+    # Compared before the row is written; the index only holds names and slugs
+    instance._touches_suggestions = touches_suggestions(instance, update_fields)
+
+
+def invalidate_suggestions(sender, instance, **kwargs):
+    if getattr(instance, "_touches_suggestions", True):
+        invalidate_index()
+        transaction.on_commit(bump_suggest_version)
+
+
+for model in SUGGEST_MODELS:
+    pre_save.connect(check_suggestions, sender=model)
+    post_save.connect(invalidate_suggestions, sender=model)
+    post_delete.connect(invalidate_suggestions, sender=model)
+
+
+def build_image_variants(sender, instance, **kwargs):
+    # Stale variants are rebuilt (or dropped) even when the new URL can't be fetched
+    if needs_variants(instance) and (downloadable(instance.image) or instance.variants.get("files")):
+        transaction.on_commit(lambda: submit(generate_variants, sender, instance.pk))
+
+
+def evict_image_variants(sender, instance, **kwargs):
+    if instance.variants.get("files"):
+        transaction.on_commit(schedule_eviction)
+
+
+for model in IMAGE_MODELS:
+    post_save.connect(build_image_variants, sender=model)
+    post_delete.connect(evict_image_variants, sender=model)
@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, F, IntegerField, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import Product, StockMovement, StockSnapshot
+
+# Ledger ids are handed out before commit, so a slow transaction can still land
+# below the newest id. Snapshots stay this far behind to never skip such a row.
+SNAPSHOT_LAG = timedelta(minutes=5)
+
+
+def with_ledger_quantity(products=None, upto=None):
+    """
+    Annotate ``products`` with ``ledger_quantity``: their latest snapshot plus
+    the movements recorded after it (only up to movement ``upto`` if given).
+    Each product only scans the ledger tail past its snapshot.
+    """
+    if products is None:
+        products = Product.objects.all()
+    snapshots = StockSnapshot.objects.filter(product=OuterRef("pk")).order_by("-last_movement_id")
+    movements = StockMovement.objects.filter(product=OuterRef("pk"), id__gt=OuterRef("snapshot_position"))
+    if upto is not None:
+        snapshots = snapshots.filter(last_movement_id__lte=upto)
+        movements = movements.filter(id__lte=upto)
+    tail = movements.order_by().values("product").annotate(total=Sum("delta")).values("total")
+
+    return products.annotate(
+        snapshot_quantity=Coalesce(Subquery(snapshots.values("quantity")[:1]), 0, output_field=IntegerField()),
+        snapshot_position=Coalesce(Subquery(snapshots.values("last_movement_id")[:1]), 0, output_field=IntegerField()),
+    ).annotate(
+        has_tail=Exists(movements),
+        ledger_quantity=F("snapshot_quantity") + Coalesce(Subquery(tail), 0, output_field=IntegerField()),
+    )
+
+
+def take_snapshots(products=None, batch_size=1000):
+    """Snapshot every product whose ledger moved since its last snapshot."""
+    upto = StockMovement.objects.filter(
+        created_at__lt=timezone.now() - SNAPSHOT_LAG
+    ).aggregate(last=Max("id"))["last"]
+    if upto is None:
+        return 0
+    rows = (
+        with_ledger_quantity(products, upto)
+        .filter(has_tail=True)
+        .values_list("pk", "ledger_quantity")
+    )
+    snapshots = StockSnapshot.objects.bulk_create(
+        (StockSnapshot(product_id=pk, quantity=quantity, last_movement_id=upto)
+         for pk, quantity in rows.iterator(chunk_size=batch_size)),
+        batch_size=batch_size,
+    )
+    return len(snapshots)
+
+
+def find_drift(products=None):
+    """``(product_id, quantity, ledger_quantity)`` for products out of sync with the ledger."""
+    return list(
+        with_ledger_quantity(products)
+        .exclude(quantity=F("ledger_quantity"))
+        .values_list("pk", "quantity", "ledger_quantity")
+    )
+
+
+def repair_drift(products=None, batch_size=1000):
+    """Reset ``Product.quantity`` to the ledger for every drifted product."""
+    drifted = [pk for pk, _, _ in find_drift(products)]
+    if not drifted:
+        return []
+    with transaction.atomic():
+        # Lock first, then recompute: sales and restocks touching these rows
+        # wait for us, and anything already committed is in the ledger.
+        locked = Product.objects.select_for_update().filter(pk__in=drifted)
+        repaired = list(with_ledger_quantity(locked).exclude(quantity=F("ledger_quantity")))
+        now = timezone.now()
+        for product in repaired:
+            product.quantity = max(product.ledger_quantity, 0)
+            # Moves the ETag/Last-Modified validators with the stock
+            product.updated_at = now
+        Product.objects.bulk_update(repaired, ["quantity", "updated_at"], batch_size=batch_size)
+        transaction.on_commit(lambda: bump_catalog_version(Product))
+    return repaired
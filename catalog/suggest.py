@@ -0,0 +1,110 @@
+import threading
+import unicodedata
+from bisect import bisect_left
+
+from .cache import bump_version, get_versions
+from .models import Category, Product
+
+SUGGEST_MODELS = (Product, Category)
+# What the index holds of each row; stock and price changes leave it alone
+SUGGEST_FIELDS = ("name", "slug", "is_active")
+VERSION_KEY = "catalog:version:suggest"
+MAX_SCAN = 200
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse whitespace: "Limón  Tahití" -> "limon tahiti"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index over normalized names. Every word of a name is
+    a key suffix, so "tah" finds "Limón Tahití" as well as "lim" does.
+    """
+
+    def __init__(self, entries):
+        rows = []
+        for payload in entries:
+            words = normalize(payload["name"]).split()
+            for position in range(len(words)):
+                rows.append((" ".join(words[position:]), position, payload))
+        rows.sort(key=lambda row: row[0])
+        self.keys = [row[0] for row in rows]
+        self.rows = rows
+
+    def search(self, prefix, limit=8):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        matches = []
+        start = bisect_left(self.keys, prefix)
+        for key, position, payload in self.rows[start:start + MAX_SCAN]:
+            if not key.startswith(prefix):
+                break
+            matches.append((position, len(payload["name"]), payload["name"], payload))
+
+        results, seen = [], set()
+        for *_, payload in sorted(matches, key=lambda m: m[:3]):
+            identity = (payload["type"], payload["id"])
+            if identity not in seen:
+                seen.add(identity)
+                results.append(payload)
+                if len(results) == limit:
+                    break
+        return results
+
+
+def load_entries():
+    products = Product.objects.filter(is_active=True).values("id", "name", "slug")
+    categories = Category.objects.filter(is_active=True).values("id", "name", "slug")
+    return [{"type": "category", **row} for row in categories] + [{"type": "product", **row} for row in products]
+
+
+_lock = threading.Lock()
+_index = None
+_index_versions = None
+
+
+def get_index():
+    """
+    The per-process index, built lazily. It is dropped by the catalog signals
+    in this process and rebuilt when the shared suggest version moves on, so
+    writes made by other workers are picked up too.
+    """
+    global _index, _index_versions
+    versions = get_versions([VERSION_KEY])
+    index = _index
+    if index is not None and _index_versions == versions:
+        return index
+    with _lock:
+        if _index is None or _index_versions != versions:
+            _index = PrefixIndex(load_entries())
+            _index_versions = versions
+        return _index
+
+
+def invalidate_index():
+    global _index
+    _index = None
+
+
+def bump_suggest_version():
+    """Make every worker rebuild its index (after bulk writes to names, slugs or ``is_active``)."""
+    bump_version(VERSION_KEY)
+
+
+def touches_suggestions(instance, update_fields=None):
+    """Whether saving ``instance`` (a ``SUGGEST_MODELS`` row) changes what the index holds of it."""
+    if instance._state.adding:
+        return True
+    if update_fields is not None and not set(update_fields) & set(SUGGEST_FIELDS):
+        return False
+    stored = type(instance)._default_manager.filter(pk=instance.pk).values_list(*SUGGEST_FIELDS).first()
+    return stored != tuple(getattr(instance, field) for field in SUGGEST_FIELDS)
+
+
+def suggestions(prefix, limit=8):
+    return get_index().search(prefix, limit)
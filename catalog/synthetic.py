@@ -0,0 +1,111 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Category, Product, ProductImage, Sale, StockMovement, Unit
+
+CATEGORY_NAMES = ["Hierbas", "Frutas", "Tubérculos y raíces", "Procesados", "Plantas y otros"]
+UNIT_NAMES = ["4 onz", "8 onz", "12 onz", "lb", "Docena", "Unidad"]
+NAME_WORDS = [
+    "Albahaca", "Aguacate", "Calala", "Cebollín", "Culantro", "Cúrcuma", "Espinaca",
+    "Estragón", "Granadilla", "Guineo", "Jengibre", "Limón", "Mora", "Mostaza",
+    "Nopal", "Orégano", "Perejil", "Pitaya", "Plátano", "Zacate", "Chutney",
+    "Mermelada", "Frijol", "Chilote", "Nonni", "Aloe",
+]
+QUALIFIERS = [
+    "criollo", "tahití", "fresca", "maduro", "verde", "italiano", "orgánico",
+    "rojo", "de mango", "de mora", "en hoja", "en bolsa", "grande", "pequeño",
+]
+
+
+def generate_products(count, batch_size=5000, seed=0):
+    """
+    Bulk-insert ``count`` synthetic products spread over the usual categories
+    and units. Slugs are prefixed with ``synthetic-`` so they never collide
+    with real products. Returns the number of rows created.
+    """
+    rng = random.Random(seed)
+    categories = [Category.objects.get_or_create(name=name)[0] for name in CATEGORY_NAMES]
+    units = [Unit.objects.get_or_create(name=name)[0] for name in UNIT_NAMES]
+    start = Product.objects.filter(slug__startswith="synthetic-").count()
+
+    created = 0
+    while created < count:
+        batch = []
+        for n in range(start + created, start + min(created + batch_size, count)):
+            name = f"{rng.choice(NAME_WORDS)} {rng.choice(QUALIFIERS)} {n}"
+            batch.append(Product(
+                name=name,
+                slug=slugify(f"synthetic-{name}"),
+                description=f"{name} orgánico de la finca, {rng.choice(QUALIFIERS)}",
+                price=Decimal(rng.randrange(1500, 20000)) / 100,
+                quantity=rng.choice([0, rng.randrange(1, 50)]),
+                is_active=rng.random() > 0.05,
+                category=rng.choice(categories),
+                unit=rng.choice(units),
+            ))
+        Product.objects.bulk_create(batch, batch_size=batch_size)
+        # bulk_create skips Product.save, so book the opening stock here
+        StockMovement.objects.bulk_create(
+            (StockMovement(product=p, delta=p.quantity, kind=StockMovement.CORRECTION)
+             for p in batch if p.quantity),
+            batch_size=batch_size,
+        )
+        created += len(batch)
+    return created
+
+
+def generate_images(per_product, batch_size=5000):
+    """
+    Give every synthetic product without images ``per_product`` image rows,
+    the first one primary. Returns the number of rows created.
+    """
+    products = (
+        Product.objects.filter(slug__startswith="synthetic-", images__isnull=True)
+        .values_list("pk", flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+    created, batch = 0, []
+    for pk in products:
+        batch.extend(
+            ProductImage(product_id=pk, image=f"https://img.test/synthetic/{pk}-{i}.jpg", is_primary=not i)
+            for i in range(per_product)
+        )
+        if len(batch) >= batch_size:
+            created += len(ProductImage.objects.bulk_create(batch))
+            batch = []
+    if batch:
+        created += len(ProductImage.objects.bulk_create(batch))
+    return created
+
+
+def generate_sales(count, days=90, batch_size=5000, seed=0):
+    """
+    Bulk-insert ``count`` historic sales of active products spread evenly over
+    the last ``days`` days. They are history only: stock and the ledger are
+    left alone. Returns the number of rows created.
+    """
+    rng = random.Random(seed)
+    pool = list(Product.objects.filter(is_active=True).values_list("pk", "category_id", "price"))
+    if not pool:
+        return 0
+    today = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    created = 0
+    for day in range(days):
+        todo = count // days + (day < count % days)
+        sold_at = today - timedelta(days=days - 1 - day)
+        while todo:
+            size = min(todo, batch_size)
+            sales = Sale.objects.bulk_create(
+                Sale(product_id=pk, category_id=category, quantity=rng.randint(1, 3), sold_price=price)
+                for pk, category, price in (rng.choice(pool) for _ in range(size))
+            )
+            # created_at is auto_now_add, so date the batch afterwards
+            Sale.objects.filter(pk__range=(sales[0].pk, sales[-1].pk)).update(created_at=sold_at)
+            created += size
+            todo -= size
+    return created
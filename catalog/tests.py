@@ -1,3 +1,1279 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from io import StringIO
+from importlib import import_module
+from unittest.mock import patch
 
-# Create your tests here.
+import django
+import numpy as np
+from PIL import Image
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from prometheus_client import REGISTRY
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from utils.db_routers import REPLICA, PrimaryReplicaRouter, ReplicaReads, _replica_reads
+from utils.middleware import TARGET_DJANGO, CommonMiddleware as InlineCommonMiddleware
+from utils.request_stats import endpoint_stats
+
+from .api_serializers import (
+    CarouselBannerSerializer, CategoryListSerializer, CategorySerializer, OrderSerializer, ProductListSerializer, SaleSerializer,
+    StockConflict,
+)
+from .api_urls import router
+from .api_views import CarouselBannerViewSet, CategoryViewSet, ProductViewSet, SaleViewSet
+from .async_views import async_read_patterns
+from .checks import check_shared_cache, shared_cache_errors
+from .exports import pyarrow
+from .fast_serializers import (
+    FastCarouselBannerSerializer, FastCategoryListSerializer, FastCategorySerializer, FastProductListSerializer,
+)
+from .forecast import forecast, refresh_forecasts
+from .images import evict_variants
+from .renderers import FastJSONRenderer, StreamingListMixin
+from .reports import rebuild_rollups
+from .models import (
+    BusinessSettings, CarouselBanner, Category, Inventory, OutOfStock, Product, ProductCard, ProductImage, Sale,
+    ProductForecast, SalesDailyRollup, Sequence, StockMovement, StockSnapshot, Unit,
+)
+from .stock import find_drift, repair_drift, take_snapshots, with_ledger_quantity
+from .synthetic import generate_products, generate_sales
+from .pagination import ProductCursorPagination
+
+
+class CatalogTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Frutas")
+        self.unit = Unit.objects.create(name="Docena")
+
+    def make_product(self, name, **kwargs):
+        kwargs.setdefault("price", Decimal("10.00"))
+        kwargs.setdefault("quantity", 5)
+        kwargs.setdefault("category", self.category)
+        return Product.objects.create(name=name, unit=self.unit, **kwargs)
+
+
+class ProductListQueryCountTests(CatalogTestCase):
+    def add_products(self, count):
+        start = Product.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(start, start + count):
+                product = self.make_product(f"Producto {i}")
+                ProductImage.objects.create(product=product, image=f"https://img.test/{i}-a")
+                ProductImage.objects.create(product=product, image=f"https://img.test/{i}-b", is_primary=True)
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/products/")
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_products(self):
+        self.add_products(2)
+        few = self.count_list_queries()
+        self.add_products(8)
+        many = self.count_list_queries()
+        self.assertEqual(few, many)
+
+    def test_primary_image_is_preferred(self):
+        self.add_products(1)
+        product = self.client.get("/api/products/").json()["results"][0]
+        self.assertTrue(product["primary_image"]["is_primary"])
+        self.assertTrue(product["primary_image"]["image"].endswith("-b"))
+
+    def test_falls_back_to_first_image(self):
+        product = self.make_product("Sin portada")
+        first = ProductImage.objects.create(product=product, image="https://img.test/first")
+        ProductImage.objects.create(product=product, image="https://img.test/second")
+        data = self.client.get("/api/products/").json()["results"][0]
+        self.assertEqual(data["primary_image"]["id"], first.id)
+
+
+class ProductPaginationTests(CatalogTestCase):
+    def test_walks_every_product_once(self):
+        for i in range(7):
+            self.make_product(f"Producto {i}")
+        seen = []
+        url = "/api/products/?page_size=3"
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page["results"]), 3)
+            seen += [p["id"] for p in page["results"]]
+            url = page["next"]
+        expected = list(Product.objects.order_by("-updated_at", "-id").values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_page_size_is_capped(self):
+        for i in range(4):
+            self.make_product(f"Producto {i}")
+        with patch.object(ProductCursorPagination, "max_page_size", 2):
+            page = self.client.get("/api/products/?page_size=50").json()
+        self.assertEqual(len(page["results"]), 2)
+        self.assertIsNotNone(page["next"])
+
+
+class CatalogResponseCacheTests(CatalogTestCase):
+    def test_repeat_list_is_served_from_cache(self):
+        self.make_product("Aguacate")
+        first = self.client.get("/api/products/").json()
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/products/").json()
+        self.assertEqual(first, second)
+
+    def test_product_save_invalidates_list(self):
+        product = self.make_product("Aguacate")
+        self.client.get("/api/products/")
+        product.price = Decimal("12.50")
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        data = self.client.get("/api/products/").json()
+        self.assertEqual(data["results"][0]["price"], "12.50")
+
+    def test_related_model_change_invalidates_list(self):
+        self.make_product("Aguacate")
+        self.client.get("/api/products/")
+        self.unit.name = "Unidad"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.unit.save()
+        data = self.client.get("/api/products/").json()
+        self.assertEqual(data["results"][0]["unit"]["name"], "Unidad")
+
+    def test_delete_invalidates_settings(self):
+        settings_obj = BusinessSettings.objects.create(whatsapp_number="50500000000")
+        self.assertEqual(len(self.client.get("/api/settings/").json()), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            settings_obj.delete()
+        self.assertEqual(self.client.get("/api/settings/").json(), [])
+
+
+class ConditionalGetTests(CatalogTestCase):
+    def test_matching_etag_returns_not_modified(self):
+        self.make_product("Aguacate")
+        response = self.client.get("/api/products/")
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_cached_response_answers_without_queries(self):
+        self.client.get("/api/categories/")
+        etag = self.client.get("/api/categories/")["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_when_related_rows_change(self):
+        product = self.make_product("Aguacate")
+        etag = self.client.get(f"/api/products/{product.id}/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProductImage.objects.create(product=product, image="https://img.test/a")
+        response = self.client.get(f"/api/products/{product.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        response = self.client.get(f"/api/products/{product.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since(self):
+        self.make_product("Aguacate")
+        last_modified = self.client.get("/api/products/")["Last-Modified"]
+        response = self.client.get("/api/products/", HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+
+class SaleStockTests(CatalogTestCase):
+    def test_sale_decrements_stock(self):
+        product = self.make_product("Aguacate", quantity=5)
+        Sale.objects.create(product=product, quantity=2, sold_price=Decimal("10.00"))
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 3)
+
+    def test_stale_product_cannot_oversell(self):
+        product = self.make_product("Aguacate", quantity=1)
+        stale = Product.objects.get(pk=product.pk)
+        Sale.objects.create(product=product, quantity=1, sold_price=Decimal("10.00"))
+        with self.assertRaises(OutOfStock):
+            Sale.objects.create(product=stale, quantity=1, sold_price=Decimal("10.00"))
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 0)
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_serializer_reports_conflict(self):
+        product = self.make_product("Aguacate", quantity=1)
+        serializer = SaleSerializer(data={"product": product.pk, "quantity": 1, "sold_price": "10.00"})
+        self.assertTrue(serializer.is_valid())
+        Product.objects.filter(pk=product.pk).update(quantity=0)
+        with self.assertRaises(StockConflict):
+            serializer.save()
+
+    def test_sale_invalidates_cached_availability(self):
+        product = self.make_product("Aguacate", quantity=3)
+        self.client.get("/api/products/")
+        with self.captureOnCommitCallbacks(execute=True):
+            Sale.objects.create(product=product, quantity=3, sold_price=Decimal("10.00"))
+        data = self.client.get("/api/products/").json()
+        self.assertFalse(data["results"][0]["in_stock"])
+
+
+class OrderTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(User.objects.create_user("caja", is_staff=True))
+
+    def basket(self, products, quantity=1):
+        return {"lines": [
+            {"product": p.pk, "quantity": quantity, "sold_price": str(p.price)} for p in products
+        ]}
+
+    def test_books_every_line(self):
+        products = [self.make_product(f"Producto {i}", quantity=3) for i in range(3)]
+        response = self.client.post("/api/orders/", self.basket(products, 2), format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()["lines"]), 3)
+        self.assertEqual(Sale.objects.count(), 3)
+        self.assertEqual(set(Product.objects.values_list("quantity", flat=True)), {1})
+
+    def test_requires_staff(self):
+        product = self.make_product("Aguacate", quantity=3)
+        for user in (None, User.objects.create_user("cliente")):
+            self.client.force_authenticate(user)
+            response = self.client.post("/api/orders/", self.basket([product]), format="json")
+            self.assertIn(response.status_code, (401, 403))
+        self.assertEqual(Sale.objects.count(), 0)
+        self.assertEqual(Product.objects.get(pk=product.pk).quantity, 3)
+
+    def test_query_count_does_not_grow_with_basket(self):
+        def checkout_queries(count):
+            products = [self.make_product(f"Cesta {count}-{i}") for i in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post("/api/orders/", self.basket(products), format="json")
+            self.assertEqual(response.status_code, 201)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(checkout_queries(2), checkout_queries(10))
+
+    def test_short_line_rejects_whole_basket(self):
+        plenty = self.make_product("Aguacate", quantity=5)
+        scarce = self.make_product("Granadilla", quantity=2)
+        basket = self.basket([plenty, scarce], 2)
+        serializer = OrderSerializer(data=basket)
+        self.assertTrue(serializer.is_valid())
+
+        # Stock runs out between validation and booking
+        Product.objects.filter(pk=scarce.pk).update(quantity=1)
+        with self.assertRaisesMessage(StockConflict, "Granadilla (only 1 left)"):
+            serializer.save()
+        self.assertEqual(Sale.objects.count(), 0)
+        self.assertEqual(Product.objects.get(pk=plenty.pk).quantity, 5)
+
+    def test_repeated_product_lines_are_summed(self):
+        product = self.make_product("Aguacate", quantity=3)
+        basket = self.basket([product, product], 2)
+        self.assertEqual(self.client.post("/api/orders/", basket, format="json").status_code, 400)
+        with self.assertRaises(OutOfStock):
+            Sale.book([(product, 2, product.price)] * 2)
+        self.assertEqual(Product.objects.get(pk=product.pk).quantity, 3)
+
+
+class InventorySkuTests(CatalogTestCase):
+    def test_skus_count_past_999(self):
+        Sequence.objects.update_or_create(name=Inventory.SKU_SEQUENCE, defaults={"last_value": 998})
+        product = self.make_product("Aguacate")
+        skus = [Inventory.objects.create(product=product, quantity=1).sku for _ in range(3)]
+        self.assertEqual(skus, ["P999", "P1000", "P1001"])
+
+    def test_reserved_blocks_do_not_overlap(self):
+        first = Inventory.reserve_skus(3)
+        second = Inventory.reserve_skus(2)
+        self.assertEqual(len(set(first + second)), 5)
+        self.assertEqual(Inventory.objects.create(product=self.make_product("Aguacate")).sku,
+                         Inventory.format_sku(Sequence.objects.get(name=Inventory.SKU_SEQUENCE).last_value))
+
+    def test_migration_seeds_sequence_and_repairs_skus(self):
+        seed_sku_sequence = import_module("catalog.migrations.0014_inventory_sku_sequence").seed_sku_sequence
+        product = self.make_product("Aguacate")
+        Inventory.objects.bulk_create([
+            Inventory(product=product, sku="P999"),
+            Inventory(product=product, sku="P1000"),
+            Inventory(product=product, sku="legacy"),
+        ])
+        Sequence.objects.all().delete()
+        seed_sku_sequence(django_apps, None)
+        self.assertTrue(Inventory.objects.filter(sku="P1001").exists())
+        self.assertEqual(Inventory.reserve_skus(1), ["P1002"])
+
+
+class StockLedgerTests(CatalogTestCase):
+    def ledger(self, product):
+        return with_ledger_quantity(Product.objects.filter(pk=product.pk)).get().ledger_quantity
+
+    def test_movements_follow_stock(self):
+        product = self.make_product("Aguacate", quantity=2)
+        Inventory.objects.create(product=product, quantity=5)
+        Sale.objects.create(product=product, quantity=3, sold_price=Decimal("10.00"))
+        Sale.book([(product, 1, product.price)])
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 3)
+        self.assertEqual(self.ledger(product), 3)
+        self.assertEqual(
+            list(product.stock_movements.order_by("id").values_list("kind", "delta")),
+            [("correction", 2), ("restock", 5), ("sale", -3), ("sale", -1)],
+        )
+
+    def test_snapshot_bounds_the_scan(self):
+        product = self.make_product("Aguacate", quantity=4)
+        with patch("catalog.stock.SNAPSHOT_LAG", timedelta(0)):
+            self.assertEqual(take_snapshots(), 1)
+            self.assertEqual(take_snapshots(), 0)
+        snapshot = StockSnapshot.objects.get(product=product)
+        self.assertEqual(snapshot.quantity, 4)
+
+        # Older ledger rows no longer count once a snapshot covers them
+        StockMovement.objects.filter(pk__lte=snapshot.last_movement_id).update(delta=0)
+        Inventory.objects.create(product=product, quantity=1)
+        self.assertEqual(self.ledger(product), 5)
+
+    def test_repairs_drift(self):
+        product = self.make_product("Aguacate", quantity=4)
+        Product.objects.filter(pk=product.pk).update(quantity=9)
+        self.assertEqual(find_drift(), [(product.pk, 9, 4)])
+        self.assertEqual(len(repair_drift()), 1)
+        self.assertEqual(Product.objects.get(pk=product.pk).quantity, 4)
+        self.assertEqual(find_drift(), [])
+
+    def test_repair_changes_validators(self):
+        product = self.make_product("Aguacate", quantity=4)
+        Product.objects.filter(pk=product.pk).update(quantity=9)
+        url = f"/api/products/{product.pk}/"
+        etag = self.client.get(url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            repair_drift()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["availability"], 4)
+
+    def test_reconcile_command(self):
+        product = self.make_product("Aguacate", quantity=4)
+        Product.objects.filter(pk=product.pk).update(quantity=0)
+        out = StringIO()
+        call_command("reconcile_stock", "--fix", stdout=out)
+        self.assertIn("Aguacate: quantity=0 ledger=4", out.getvalue())
+        self.assertEqual(Product.objects.get(pk=product.pk).quantity, 4)
+
+
+class ProductCardTests(CatalogTestCase):
+    def reference_rows(self):
+        products = Product.objects.filter(is_active=True).order_by("-updated_at", "-id").prefetch_related("images")
+        return [dict(row) for row in ProductListSerializer(products, many=True).data]
+
+    def test_cards_match_the_serializer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                product = self.make_product(f"Producto {i}", quantity=i)
+                ProductImage.objects.create(product=product, image=f"https://img.test/{i}", is_primary=True)
+        self.assertEqual(ProductCard.objects.count(), 3)
+        self.assertEqual(self.client.get("/api/products/").json()["results"], self.reference_rows())
+
+    def test_missing_cards_are_rendered_and_stored(self):
+        self.make_product("Aguacate")
+        self.assertFalse(ProductCard.objects.exists())
+        self.assertEqual(self.client.get("/api/products/").json()["results"], self.reference_rows())
+        self.assertEqual(ProductCard.objects.count(), 1)
+
+    def test_stock_is_read_live(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.make_product("Aguacate", quantity=2)
+        Sale.objects.create(product=product, quantity=2, sold_price=Decimal("10.00"))
+        row = self.client.get("/api/products/").json()["results"][0]
+        self.assertEqual((row["in_stock"], row["availability"]), (False, 0))
+
+    def test_category_rename_refreshes_cards(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.make_product("Aguacate")
+        self.category.name = "Frutas tropicales"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        self.assertEqual(ProductCard.objects.get(pk=product.pk).payload["category"]["name"], "Frutas tropicales")
+
+
+class FastSerializerParityTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        Category.objects.create(name="Procesados", icon="🫙", description="Mermeladas")
+        Category.objects.create(name="Hierbas", is_active=False)
+        CarouselBanner.objects.create(
+            title="Temporada", image="https://img.test/b1", link="https://eco.test", order=2,
+            variants={"source": "https://img.test/b1", "files": [{"format": "webp", "width": 640, "name": "b1.webp"}]},
+        )
+        CarouselBanner.objects.create(image="https://img.test/b2")
+        with_images = self.make_product("Aguacate", price=Decimal("12.5"), quantity=0)
+        ProductImage.objects.create(product=with_images, image="https://img.test/1", tag="front")
+        ProductImage.objects.create(
+            product=with_images, image="https://img.test/2", is_primary=True,
+            variants={"source": "https://img.test/2", "files": [{"format": "avif", "width": 160, "name": "2.avif"}]},
+        )
+        self.make_product("Mora fresca", price=Decimal("125"))
+
+    def assertParity(self, fast_class, serializer_class, queryset):
+        reference = [dict(row) for row in serializer_class(queryset, many=True).data]
+        self.assertEqual(fast_class().serialize(queryset), reference)
+
+    def test_category(self):
+        self.assertParity(FastCategorySerializer, CategorySerializer, Category.objects.order_by("name"))
+
+    def test_category_list(self):
+        queryset = Category.with_product_stats().order_by("name")
+        self.assertParity(FastCategoryListSerializer, CategoryListSerializer, queryset)
+
+    def test_carousel_banner(self):
+        self.assertParity(FastCarouselBannerSerializer, CarouselBannerSerializer, CarouselBanner.objects.all())
+
+    def test_product_list(self):
+        queryset = Product.objects.order_by("id").prefetch_related("images")
+        self.assertParity(FastProductListSerializer, ProductListSerializer, queryset)
+
+    def test_endpoints_match_reference(self):
+        for url in ("/api/categories/", "/api/carousel/"):
+            with self.settings(CATALOG_FAST_SERIALIZERS=True):
+                fast = self.client.get(url).json()
+            cache.clear()
+            with self.settings(CATALOG_FAST_SERIALIZERS=False):
+                reference = self.client.get(url).json()
+            cache.clear()
+            self.assertEqual(fast, reference)
+
+
+class JSONRenderingTests(CatalogTestCase):
+    def test_decimals_and_datetimes(self):
+        data = {"price": Decimal("12.50"), "at": datetime(2025, 9, 25, 21, 54, tzinfo=timezone.utc), "name": "Limón"}
+        self.assertEqual(
+            json.loads(FastJSONRenderer().render(data)),
+            {"price": "12.50", "at": "2025-09-25T21:54:00Z", "name": "Limón"},
+        )
+
+    def test_sales_list_is_streamed(self):
+        product = self.make_product("Aguacate", quantity=10)
+        for _ in range(5):
+            Sale.objects.create(product=product, quantity=1, sold_price=Decimal("9.99"))
+        self.assertEqual(self.client.get("/api/sales/").status_code, 403)
+        self.client.force_authenticate(User.objects.create_superuser("admin", "admin@example.com", "secret"))
+        with patch.object(StreamingListMixin, "stream_chunk_size", 2):
+            response = self.client.get("/api/sales/", HTTP_ACCEPT="application/json")
+            body = b"".join(response.streaming_content)
+        self.assertTrue(response.streaming)
+        expected = SaleSerializer(Sale.objects.order_by("-created_at"), many=True).data
+        self.assertEqual(json.loads(body), json.loads(JSONRenderer().render(expected)))
+
+
+class CategoryStatsTests(CatalogTestCase):
+    def test_aggregates_active_products(self):
+        self.make_product("Aguacate", price=Decimal("15.00"), quantity=0)
+        self.make_product("Mora", price=Decimal("125.00"))
+        self.make_product("Oculto", price=Decimal("1.00"), is_active=False)
+        Category.objects.create(name="Vacía")
+        data = {c["name"]: c for c in self.client.get("/api/categories/").json()}
+        self.assertEqual(
+            {k: data["Frutas"][k] for k in ("product_count", "in_stock_count", "min_price", "max_price")},
+            {"product_count": 2, "in_stock_count": 1, "min_price": "15.00", "max_price": "125.00"},
+        )
+        self.assertEqual((data["Vacía"]["product_count"], data["Vacía"]["min_price"]), (0, None))
+
+    def test_sale_refreshes_cached_stats(self):
+        product = self.make_product("Aguacate", quantity=1)
+        response = self.client.get("/api/categories/")
+        self.assertEqual(response.json()[0]["in_stock_count"], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Sale.objects.create(product=product, quantity=1, sold_price=Decimal("10.00"))
+        response = self.client.get("/api/categories/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["in_stock_count"], 0)
+
+
+class ProductSearchTests(CatalogTestCase):
+    def test_search_matches_name_and_description(self):
+        self.make_product("Limón Tahití")
+        self.make_product("Mora", description="Ideal con limón")
+        self.make_product("Aguacate")
+        data = self.client.get("/api/products/", {"search": "limón"}).json()
+        self.assertEqual(sorted(p["name"] for p in data["results"]), ["Limón Tahití", "Mora"])
+
+    def test_synthetic_catalog_is_searchable(self):
+        self.assertEqual(generate_products(50, batch_size=20), 50)
+        self.assertEqual(Product.objects.filter(slug__startswith="synthetic-").count(), 50)
+        self.assertEqual(find_drift(), [])
+        data = self.client.get("/api/products/", {"search": "orgánico", "page_size": 100}).json()
+        self.assertTrue(data["results"])
+
+
+class ProductSuggestTests(CatalogTestCase):
+    def test_prefix_matches_any_word_ignoring_accents(self):
+        self.make_product("Limón Tahití")
+        self.make_product("Limón Criollo")
+        self.make_product("Aguacate")
+        names = [s["name"] for s in self.client.get("/api/products/suggest/", {"q": "tahi"}).json()]
+        self.assertEqual(names, ["Limón Tahití"])
+        names = [s["name"] for s in self.client.get("/api/products/suggest/", {"q": "LIMON"}).json()]
+        self.assertEqual(names, ["Limón Tahití", "Limón Criollo"])
+
+    def test_includes_categories(self):
+        suggestions = self.client.get("/api/products/suggest/", {"q": "fru"}).json()
+        self.assertEqual(suggestions, [{"type": "category", "id": self.category.id, "name": "Frutas", "slug": "frutas"}])
+
+    def test_served_without_queries_and_rebuilt_on_change(self):
+        product = self.make_product("Aguacate")
+        self.client.get("/api/products/suggest/", {"q": "agu"})
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.client.get("/api/products/suggest/", {"q": "agu"}).json()), 1)
+        product.is_active = False
+        product.save()
+        self.assertEqual(self.client.get("/api/products/suggest/", {"q": "agu"}).json(), [])
+
+    def test_stock_and_price_changes_keep_the_index(self):
+        product = self.make_product("Aguacate", quantity=10)
+        self.client.get("/api/products/suggest/", {"q": "agu"})
+        with self.captureOnCommitCallbacks(execute=True):
+            Sale.objects.create(product=product, quantity=1, sold_price=product.price)
+            product.refresh_from_db()
+            product.price = Decimal("11.00")
+            product.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.client.get("/api/products/suggest/", {"q": "agu"}).json()), 1)
+
+
+@unittest.skipIf(connection.vendor == "sqlite", "needs a database with concurrent writers")
+class ConcurrentSaleTests(TransactionTestCase):
+    def test_concurrent_sales_never_oversell(self):
+        category = Category.objects.create(name="Frutas")
+        unit = Unit.objects.create(name="Docena")
+        product = Product.objects.create(
+            name="Aguacate", category=category, unit=unit, price=Decimal("10.00"), quantity=5
+        )
+        workers = 20
+        barrier = threading.Barrier(workers)
+        results = []
+
+        def buy():
+            barrier.wait()
+            try:
+                Sale.objects.create(product=Product.objects.get(pk=product.pk), quantity=1, sold_price=Decimal("10.00"))
+                results.append(True)
+            except OutOfStock:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(results.count(True), 5)
+        self.assertEqual(product.quantity, 0)
+        self.assertEqual(Sale.objects.count(), 5)
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN the hot read paths and fail on a sequential scan of a catalog
+    table. On PostgreSQL seq scans are switched off first, so a Seq Scan
+    left in the plan means no index can serve the query at all.
+    """
+    HOT_TABLES = ("catalog_product", "catalog_productimage", "catalog_category", "catalog_carouselbanner", "catalog_sale")
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_products(2000, seed=1)
+        products = list(Product.objects.values_list("pk", "category_id")[:500])
+        ProductImage.objects.bulk_create(
+            ProductImage(product_id=pk, image=f"https://img.test/{pk}", is_primary=not i % 2)
+            for i, (pk, _) in enumerate(products)
+        )
+        Sale.objects.bulk_create(
+            Sale(product_id=pk, category_id=category, quantity=1, sold_price=Decimal("10.00"))
+            for pk, category in products
+        )
+        CarouselBanner.objects.bulk_create(CarouselBanner(title=f"Banner {i}", order=i) for i in range(20))
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def view_queryset(self, viewset, action="list", **params):
+        view = viewset(action=action, action_map={"get": action}, format_kwarg=None, kwargs={})
+        view.request = view.initialize_request(self.factory.get("/", params))
+        return view.filter_queryset(view.get_queryset())
+
+    def explain(self, queryset):
+        # QuerySet.explain() mangles window-filtered queries, so EXPLAIN the compiled SQL directly
+        sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return "\n".join(" ".join(map(str, row)) for row in cursor.fetchall())
+
+    def assertNoSeqScan(self, queryset, tables=HOT_TABLES):
+        plan = self.explain(queryset)
+        if connection.vendor == "postgresql":
+            pattern = r"Seq Scan on (\w+)"
+        else:
+            pattern = r"SCAN (\w+)(?! USING)\s*$"
+        scanned = set(re.findall(pattern, plan, re.MULTILINE)) & set(tables)
+        self.assertFalse(scanned, f"sequential scan of {', '.join(sorted(scanned))}:\n{plan}")
+
+    def test_product_list(self):
+        ordering = ProductCursorPagination.ordering
+        self.assertNoSeqScan(self.view_queryset(ProductViewSet).order_by(*ordering)[:25])
+        self.assertNoSeqScan(self.view_queryset(ProductViewSet, in_stock="1").order_by(*ordering)[:25])
+        self.assertNoSeqScan(self.view_queryset(ProductViewSet, category__slug="frutas").order_by(*ordering)[:25])
+
+    def test_product_retrieve(self):
+        pk = Product.objects.values_list("pk", flat=True).first()
+        self.assertNoSeqScan(self.view_queryset(ProductViewSet, action="retrieve").filter(pk=pk))
+
+    def test_primary_images(self):
+        ids = list(Product.objects.values_list("pk", flat=True)[:25])
+        self.assertNoSeqScan(ProductImage.primary_per_product(ProductImage.objects.filter(product_id__in=ids)))
+
+    def test_category_and_banner_lists(self):
+        # Grouping walks every category (a handful of rows); the product side must stay on an index
+        self.assertNoSeqScan(self.view_queryset(CategoryViewSet), tables=("catalog_product",))
+        self.assertNoSeqScan(self.view_queryset(CarouselBannerViewSet))
+
+    def test_sale_list(self):
+        self.assertNoSeqScan(self.view_queryset(SaleViewSet).order_by("-created_at")[:50])
+
+
+class RequestStatsTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        endpoint_stats.reset()
+
+    def test_records_queries_per_action_with_server_timing(self):
+        self.make_product("Aguacate")
+        response = self.client.get("/api/products/")
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, render')
+        self.client.get("/api/products/")
+
+        stats = endpoint_stats.snapshot()["ProductViewSet.list"]
+        self.assertEqual(stats["requests"], 2)
+        self.assertGreater(stats["queries"]["max"], 0)
+        self.assertEqual(set(stats), {"requests", "window", "queries", "sql_ms", "serialize_ms", "render_ms", "total_ms"})
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.client.get("/api/categories/")
+        self.assertIn(self.client.get("/api/_stats/").status_code, (401, 403))
+
+        admin = User.objects.create_superuser("admin", "admin@example.com", "secret")
+        self.client.force_authenticate(admin)
+        response = self.client.get("/api/_stats/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("CategoryViewSet.list", response.json())
+
+
+class MetricsTests(CatalogTestCase):
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_and_cache_metrics(self):
+        requests = self.sample("http_requests_total", endpoint="CategoryViewSet.list", method="GET", status="200")
+        misses = self.sample("catalog_response_cache_total", viewset="category", result="miss")
+        hits = self.sample("catalog_response_cache_total", viewset="category", result="hit")
+        self.client.get("/api/categories/")
+        self.client.get("/api/categories/")
+
+        with self.settings(METRICS_TOKEN="scrape-secret"):
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_request_duration_seconds_bucket{endpoint="CategoryViewSet.list"', response.content)
+        self.assertEqual(
+            self.sample("http_requests_total", endpoint="CategoryViewSet.list", method="GET", status="200"), requests + 2
+        )
+        self.assertEqual(self.sample("catalog_response_cache_total", viewset="category", result="miss"), misses + 1)
+        self.assertEqual(self.sample("catalog_response_cache_total", viewset="category", result="hit"), hits + 1)
+
+    def test_metrics_need_staff_or_the_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        with self.settings(METRICS_TOKEN="scrape-secret"):
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret").status_code, 200)
+        with self.settings(METRICS_TOKEN=""):
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer ").status_code, 401)
+        self.client.force_login(User.objects.create_user("cliente", password="secret"))
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        self.client.force_login(User.objects.create_user("caja", password="secret", is_staff=True))
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    def test_sales_and_stock_outs(self):
+        product = self.make_product("Aguacate", quantity=3)
+        sales, units = self.sample("catalog_sales_total"), self.sample("catalog_sale_units_total")
+        stock_outs = self.sample("catalog_stock_outs_total", source="sale")
+        with self.captureOnCommitCallbacks(execute=True):
+            Sale.objects.create(product=product, quantity=2, sold_price=Decimal("10.00"))
+        with self.assertRaises(OutOfStock):
+            Sale.objects.create(product=product, quantity=2, sold_price=Decimal("10.00"))
+
+        self.assertEqual(self.sample("catalog_sales_total"), sales + 1)
+        self.assertEqual(self.sample("catalog_sale_units_total"), units + 2)
+        self.assertEqual(self.sample("catalog_stock_outs_total", source="sale"), stock_outs + 1)
+
+    def test_refused_requests_count_as_stock_outs(self):
+        product = self.make_product("Aguacate", quantity=3)
+        sales = self.sample("catalog_stock_outs_total", source="sale")
+        orders = self.sample("catalog_stock_outs_total", source="order")
+        serializer = SaleSerializer(data={"product": product.pk, "quantity": 4, "sold_price": "10.00"})
+        self.assertFalse(serializer.is_valid())
+        self.client.force_authenticate(User.objects.create_user("caja", is_staff=True))
+        response = self.client.post(
+            "/api/orders/", {"lines": [{"product": product.pk, "quantity": 4, "sold_price": "10.00"}]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.sample("catalog_stock_outs_total", source="sale"), sales + 1)
+        self.assertEqual(self.sample("catalog_stock_outs_total", source="order"), orders + 1)
+
+
+class BenchmarkApiTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_product("Aguacate", quantity=50)
+        self.output = os.path.join(tempfile.mkdtemp(), "baseline.json")
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.output))
+
+    def test_writes_baseline_and_flags_regressions(self):
+        call_command("benchmark_api", requests=3, output=self.output, stdout=StringIO())
+        with open(self.output) as fh:
+            report = json.load(fh)
+        self.assertEqual(report["meta"]["mode"], "client")
+        stats = report["scenarios"]["product_list"]
+        self.assertEqual((stats["requests"], stats["errors"]), (3, 0))
+        self.assertGreater(stats["queries_max"], 0)
+        self.assertNotIn("order_create", report["scenarios"])
+        self.assertEqual(Sale.objects.count(), 0)
+
+        # A baseline with fewer queries and much lower latency must fail the comparison
+        for scenario in report["scenarios"].values():
+            scenario.update(p95_ms=0.001, queries_max=0)
+        with open(self.output, "w") as fh:
+            json.dump(report, fh)
+        with self.assertRaisesMessage(CommandError, "regression"):
+            call_command("benchmark_api", requests=3, compare=self.output, stdout=StringIO())
+
+    def test_orders_are_opt_in_and_placed_as_staff(self):
+        with self.assertRaisesMessage(CommandError, "No staff user"):
+            call_command("benchmark_api", requests=3, with_orders="nadie", stdout=StringIO())
+        User.objects.create_user("caja", is_staff=True)
+        call_command("benchmark_api", requests=3, with_orders="caja", output=self.output, stdout=StringIO())
+        with open(self.output) as fh:
+            report = json.load(fh)
+        self.assertTrue(report["meta"]["orders"])
+        self.assertEqual(report["scenarios"]["order_create"]["errors"], 0)
+        self.assertEqual(Sale.objects.count(), 3)
+
+    def test_several_workers_need_a_shared_cache(self):
+        locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://r"}}
+        with self.settings(CACHES=locmem):
+            self.assertEqual(shared_cache_errors(1), [])
+            self.assertEqual([error.id for error in shared_cache_errors(4)], ["catalog.E001"])
+            with patch.dict(os.environ, {"WEB_CONCURRENCY": "3"}):
+                self.assertEqual([error.id for error in check_shared_cache()], ["catalog.E001"])
+        with self.settings(CACHES=redis):
+            self.assertEqual(shared_cache_errors(4), [])
+
+    def test_synthetic_sales_span_days(self):
+        self.assertEqual(generate_sales(10, days=5), 10)
+        self.assertEqual(Sale.objects.dates("created_at", "day").count(), 5)
+
+
+class ImportCatalogTests(CatalogTestCase):
+    def write(self, name, content):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, name)
+        with open(path, "w") as fh:
+            fh.write(content)
+        return path
+
+    def test_upserts_products_stock_and_images(self):
+        existing = self.make_product("Aguacate", quantity=5)
+        path = self.write("catalog.csv", (
+            "name,price,category,unit,quantity,image\n"
+            "Aguacate,12.50,Frutas,Docena,8,https://img.test/aguacate.jpg\n"
+            "Jengibre,35,Tubérculos y raíces,8 onz,4,\n"
+            "Jengibre,40,Tubérculos y raíces,8 onz,6,\n"
+        ))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("import_catalog", path, batch_size=2, stdout=StringIO())
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.price, existing.quantity), (Decimal("12.50"), 8))
+        ginger = Product.objects.get(slug="jengibre")
+        self.assertEqual((ginger.price, ginger.quantity, ginger.unit.name), (Decimal("40.00"), 6, "8 onz"))
+        self.assertEqual(ginger.category.name, "Tubérculos y raíces")
+        self.assertTrue(existing.images.get().is_primary)
+        self.assertEqual(ProductCard.objects.get(product=ginger).payload["price"], "40.00")
+        self.assertEqual(find_drift(), [])
+
+    def test_jsonl_dry_run_and_bad_rows_leave_nothing_behind(self):
+        path = self.write("catalog.jsonl", '{"name": "Mora", "price": 125, "category": "Frutas", "unit": "lb"}\n')
+        call_command("import_catalog", path, dry_run=True, stdout=StringIO())
+        self.assertFalse(Product.objects.exists())
+
+        path = self.write("bad.jsonl", (
+            '{"name": "Mora", "price": 125, "category": "Frutas", "unit": "lb"}\n'
+            '{"name": "Nopal", "price": "barato", "category": "Frutas", "unit": "lb"}\n'
+        ))
+        with self.assertRaisesMessage(CommandError, "line 2: invalid price"):
+            call_command("import_catalog", path, batch_size=1, stdout=StringIO())
+        self.assertFalse(Product.objects.exists())
+
+    def test_rejects_prices_that_are_not_finite_or_negative(self):
+        for price in ("NaN", "sNaN", "Infinity", "-inf", "-0.01"):
+            path = self.write("catalog.csv", f"name,price,category,unit\nMora,{price},Frutas,lb\n")
+            with self.subTest(price=price), self.assertRaisesMessage(CommandError, f"line 2: invalid price '{price}'"):
+                call_command("import_catalog", path, stdout=StringIO())
+        self.assertFalse(Product.objects.exists())
+
+    def test_rejects_values_the_database_cannot_store(self):
+        long_name = "x" * 256
+        cases = [
+            (f"{long_name},10,Frutas,lb,", "invalid name"),
+            ("Mora,1e9,Frutas,lb,", "invalid price"),
+            ("Mora,1.234,Frutas,lb,", "invalid price"),
+            (f"Mora,10,{'x' * 121},lb,", "invalid category"),
+            (f"Mora,10,Frutas,{'x' * 51},", "invalid unit"),
+            ("Mora,10,Frutas,lb,2147483648", "invalid quantity"),
+        ]
+        for row, message in cases:
+            path = self.write("catalog.csv", f"name,price,category,unit,quantity\n{row}\n")
+            with self.subTest(row=row), self.assertRaisesMessage(CommandError, f"line 2: {message}"):
+                call_command("import_catalog", path, stdout=StringIO())
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(Unit.objects.filter(name__startswith="xxx").exists())
+
+
+class ExportTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        product = self.make_product("Aguacate", quantity=10)
+        for day, quantity in ((1, 1), (2, 2), (3, 3)):
+            sale = Sale.objects.create(product=product, quantity=quantity, sold_price=Decimal("10.00"))
+            Sale.objects.filter(pk=sale.pk).update(created_at=datetime(2026, 3, day, 15, tzinfo=timezone.utc))
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "secret")
+
+    def test_csv_export_filters_by_day(self):
+        self.assertIn(self.client.get("/api/exports/sales/").status_code, (401, 403))
+        self.client.force_authenticate(self.admin)
+        response = self.client.get("/api/exports/sales/", {"from": "2026-03-02", "to": "2026-03-03"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('filename="sales-2026-03-02_2026-03-03.csv"', response["Content-Disposition"])
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual([row["quantity"] for row in rows], ["2", "3"])
+        self.assertEqual(rows[0]["product_name"], "Aguacate")
+
+        self.assertEqual(self.client.get("/api/exports/sales/", {"output": "xlsx"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/exports/nope/").status_code, 404)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet_export_streams_row_groups(self):
+        path = os.path.join(tempfile.mkdtemp(), "sales.parquet")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        call_command("export_data", "sales", format="parquet", output=path, chunk_size=2, stderr=StringIO())
+        parquet = pyarrow.parquet.ParquetFile(path)
+        self.assertEqual(parquet.num_row_groups, 2)
+        table = parquet.read()
+        self.assertEqual(table.column("quantity").to_pylist(), [1, 2, 3])
+        self.assertEqual(table.column("sold_price").to_pylist()[0], Decimal("10.00"))
+
+
+class SalesRollupTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.herbs = Category.objects.create(name="Hierbas")
+        self.avocado = self.make_product("Aguacate", price=Decimal("15.00"), quantity=50)
+        self.basil = self.make_product("Albahaca", price=Decimal("35.00"), quantity=50, category=self.herbs)
+
+    def test_sales_and_orders_update_rollups_incrementally(self):
+        Sale.objects.create(product=self.avocado, quantity=2, sold_price=Decimal("15.00"))
+        Sale.objects.create(product=self.avocado, quantity=1, sold_price=Decimal("14.50"))
+        Sale.book([(self.avocado, 3, Decimal("15.00")), (self.basil, 1, Decimal("35.00"))])
+
+        avocado = SalesDailyRollup.objects.get(product=self.avocado)
+        self.assertEqual((avocado.units, avocado.revenue, avocado.transactions), (6, Decimal("89.50"), 3))
+        self.assertEqual(SalesDailyRollup.objects.get(product=self.basil).category, self.herbs)
+
+        incremental = set(SalesDailyRollup.objects.values_list("date", "product", "category", "units", "revenue", "transactions"))
+        call_command("rebuild_sales_rollups", stdout=StringIO())
+        rebuilt = set(SalesDailyRollup.objects.values_list("date", "product", "category", "units", "revenue", "transactions"))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_sales_keep_the_category_they_were_sold_in(self):
+        Sale.objects.create(product=self.avocado, quantity=2, sold_price=Decimal("15.00"))
+        self.avocado.category = self.herbs
+        self.avocado.save()
+        Sale.book([(self.avocado, 1, Decimal("15.00"))])
+
+        incremental = set(SalesDailyRollup.objects.values_list("product", "category", "units"))
+        self.assertEqual(incremental, {(self.avocado.pk, self.category.pk, 2), (self.avocado.pk, self.herbs.pk, 1)})
+        call_command("rebuild_sales_rollups", stdout=StringIO())
+        self.assertEqual(set(SalesDailyRollup.objects.values_list("product", "category", "units")), incremental)
+
+    def test_report_by_period_and_group(self):
+        for day, product, quantity in ((2, self.avocado, 1), (3, self.avocado, 2), (3, self.basil, 1), (20, self.basil, 4)):
+            sale = Sale.objects.create(product=product, quantity=quantity, sold_price=product.price)
+            Sale.objects.filter(pk=sale.pk).update(created_at=datetime(2026, 3, day, 15, tzinfo=timezone.utc))
+        rebuild_rollups()
+        self.client.force_authenticate(User.objects.create_superuser("admin", "admin@example.com", "secret"))
+
+        response = self.client.get("/api/reports/sales/", {"granularity": "month"})
+        self.assertEqual(response.json()["results"], [
+            {"period": "2026-03-01", "units": 8, "revenue": "220.00", "transactions": 4},
+        ])
+        response = self.client.get("/api/reports/sales/", {
+            "from": "2026-03-01", "to": "2026-03-10", "granularity": "week", "group_by": "category",
+        })
+        self.assertEqual(
+            [(row["period"], row["category_name"], row["units"]) for row in response.json()["results"]],
+            [("2026-03-02", "Frutas", 3), ("2026-03-02", "Hierbas", 1)],
+        )
+        self.assertEqual(self.client.get("/api/reports/sales/", {"granularity": "year"}).status_code, 400)
+
+
+class ForecastTests(CatalogTestCase):
+    def test_vectorized_forecast_matches_definitions(self):
+        demand = np.array([[2.0, 0.0, 4.0, 2.0], [0.0, 0.0, 0.0, 0.0]])
+        results = forecast(demand, np.array([3.0, 0.0]), ma_window=2, alpha=0.5, lead_time=2, service_z=1.0)
+
+        level = demand[0, 0]
+        for value in demand[0, 1:]:
+            level = 0.5 * value + 0.5 * level
+        self.assertAlmostEqual(results["smoothed_demand"][0], level)
+        self.assertAlmostEqual(results["moving_average"][0], 3.0)
+        self.assertAlmostEqual(results["days_of_cover"][0], 3.0 / level)
+        self.assertEqual(results["reorder_point"][0], np.ceil(level * 2 + demand[0].std() * np.sqrt(2)))
+        self.assertTrue(np.isnan(results["days_of_cover"][1]))
+        self.assertEqual(list(results["needs_restock"]), [True, True])
+
+    def test_refresh_stores_forecasts_and_serves_them(self):
+        busy = self.make_product("Aguacate", quantity=4)
+        idle = self.make_product("Nopal", quantity=9)
+        today = date(2026, 3, 29)
+        SalesDailyRollup.objects.bulk_create(
+            SalesDailyRollup(date=today - timedelta(days=n), product=busy, category=self.category,
+                             units=3, revenue=Decimal("30.00"), transactions=1)
+            for n in range(1, 15)
+        )
+        self.assertEqual(refresh_forecasts(today=today), 2)
+
+        forecast_row = ProductForecast.objects.get(product=busy)
+        self.assertAlmostEqual(forecast_row.moving_average, 3.0)
+        self.assertTrue(forecast_row.needs_restock)
+        self.assertIsNone(ProductForecast.objects.get(product=idle).days_of_cover)
+
+        self.client.force_authenticate(User.objects.create_superuser("admin", "admin@example.com", "secret"))
+        rows = json.loads(b"".join(self.client.get("/api/forecasts/", {"needs_restock": "true"}).streaming_content))
+        self.assertEqual([row["product_name"] for row in rows], ["Aguacate"])
+
+
+class AsyncURLConf:
+    """The API as ``ASYNC_CATALOG`` mounts it under ASGI."""
+    urlpatterns = [path("api/", include(async_read_patterns(router.urls)))]
+
+
+class AsyncCatalogTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        endpoint_stats.reset()
+        CarouselBanner.objects.create(title="Temporada", image="https://img.test/b1")
+        self.settings_row = BusinessSettings.objects.create(whatsapp_number="50500000000")
+        self.product = self.make_product("Aguacate", price=Decimal("12.5"))
+        ProductImage.objects.create(product=self.product, image="https://img.test/1", is_primary=True)
+        self.make_product("Mora", quantity=0)
+
+    def get_both(self, url, **headers):
+        cache.clear()
+        reference = self.client.get(url, **headers)
+        cache.clear()
+        with self.settings(ROOT_URLCONF=AsyncURLConf):
+            response = self.client.get(url, **headers)
+        return reference, response
+
+    def test_reads_match_the_drf_views(self):
+        for url in (
+            "/api/categories/",
+            "/api/carousel/",
+            "/api/settings/",
+            f"/api/settings/{self.settings_row.pk}/",
+            "/api/products/",
+            "/api/products/?page_size=1",
+            "/api/products/?in_stock=1&category__slug=frutas",
+            "/api/products/?search=agua",
+            f"/api/products/{self.product.pk}/",
+        ):
+            with self.subTest(url=url):
+                reference, response = self.get_both(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(hasattr(response, "renderer_context"))  # not a DRF response
+                self.assertEqual(response.content, reference.content)
+                # Vary differs: no authentication, so the session (Cookie) is never read
+                for header in ("Content-Type", "ETag", "Last-Modified", "Allow"):
+                    self.assertEqual(response.get(header), reference.get(header), header)
+
+    def test_shares_cache_entries_and_validators(self):
+        etag = self.client.get("/api/products/")["ETag"]
+        with self.settings(ROOT_URLCONF=AsyncURLConf), self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/products/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            response = self.client.get("/api/products/")
+        self.assertEqual(response.json()["results"][0]["name"], "Mora")
+
+    def test_other_requests_go_to_the_drf_views(self):
+        with self.settings(ROOT_URLCONF=AsyncURLConf):
+            created = self.client.post("/api/carousel/", {"title": "Nuevo", "image": "https://img.test/b2"})
+            html = self.client.get("/api/products/", HTTP_ACCEPT="text/html")
+            missing = self.client.get("/api/products/999999/")
+            bad_cursor = self.client.get("/api/products/?cursor=nope")
+        self.assertEqual(created.status_code, 201)
+        self.assertIn("text/html", html["Content-Type"])
+        self.assertEqual((missing.status_code, bad_cursor.status_code), (404, 404))
+        self.assertEqual(missing.json(), self.client.get("/api/products/999999/").json())
+
+    async def test_async_middleware_chain_times_queries(self):
+        with self.settings(ROOT_URLCONF=AsyncURLConf):
+            response = await self.async_client.get("/api/products/")
+        self.assertEqual(response.status_code, 200)
+        queries = int(re.search(r'desc="(\d+) queries"', response["Server-Timing"]).group(1))
+        self.assertGreater(queries, 0)
+        self.assertEqual(endpoint_stats.snapshot()["ProductViewSet.list"]["queries"]["max"], queries)
+
+    async def test_inline_middleware_matches_django_middleware(self):
+        inline = [
+            "utils.middleware." + path.rsplit(".", 1)[1] if path in settings.DJANGO_MIDDLEWARE else path
+            for path in settings.MIDDLEWARE
+        ]
+        self.assertNotEqual(inline, settings.MIDDLEWARE)
+        with self.settings(ROOT_URLCONF=AsyncURLConf):
+            reference = await self.async_client.get("/api/products/", HTTP_ORIGIN="https://eco.test")
+            with self.settings(MIDDLEWARE=inline):
+                response = await self.async_client.get("/api/products/", HTTP_ORIGIN="https://eco.test")
+        self.assertEqual(response.content, reference.content)
+        for header in ("X-Frame-Options", "X-Content-Type-Options", "Referrer-Policy", "Vary", "ETag"):
+            self.assertEqual(response.get(header), reference.get(header), header)
+
+    def test_inline_middleware_pins_its_django_release(self):
+        # utils.middleware replaces MiddlewareMixin internals: revisit it before moving Django on
+        self.assertEqual(django.VERSION[:2], TARGET_DJANGO)
+        with open(os.path.join(settings.BASE_DIR, "requirements.txt")) as fh:
+            self.assertIn(f"Django=={'.'.join(map(str, TARGET_DJANGO))}.", fh.read())
+
+        async def get_response(request):
+            pass
+
+        with patch("utils.middleware.django.VERSION", (5, 0, 0, "final", 0)):
+            with self.assertRaises(ImproperlyConfigured):
+                InlineCommonMiddleware(get_response)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """A second SQLite file stands in for the replica; it only changes when ``sync_replica`` copies the primary."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Added after the test setup so the runner neither creates nor flushes it
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings[REPLICA] = {
+            **connections.settings["default"], "NAME": os.path.join(cls.replica_dir, "replica.sqlite3"),
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        shutil.rmtree(cls.replica_dir)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name="Frutas")
+        unit = Unit.objects.create(name="Docena")
+        self.product = Product.objects.create(
+            name="Aguacate", category=category, unit=unit, price=Decimal("10.00"), quantity=5
+        )
+        self.sync_replica()
+
+    def sync_replica(self):
+        for alias in ("default", REPLICA):
+            connections[alias].ensure_connection()
+        connections["default"].connection.backup(connections[REPLICA].connection)
+        cache.clear()
+
+    def product_name(self):
+        response = self.client.get(f"/api/products/{self.product.pk}/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["name"]
+
+    def test_catalog_reads_use_the_replica(self):
+        # No signals, so no read-your-writes window: the replica is simply behind
+        Product.objects.filter(pk=self.product.pk).update(name="Palta")
+        self.assertEqual(self.product_name(), "Aguacate")
+        self.assertEqual(Product.objects.get(pk=self.product.pk).name, "Palta")
+
+    def test_catalog_writes_keep_reads_on_the_primary(self):
+        self.product.name = "Palta"
+        self.product.save()
+        self.assertEqual(self.product_name(), "Palta")
+
+        with self.settings(READ_YOUR_WRITES_SECONDS=0):
+            self.product.save()
+        cache.clear()
+        self.assertEqual(self.product_name(), "Aguacate")
+
+    def test_missing_cards_are_rendered_from_the_primary(self):
+        ProductCard.objects.all().delete()
+        self.sync_replica()
+        Product.objects.filter(pk=self.product.pk).update(name="Palta")
+        response = self.client.get("/api/products/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ProductCard.objects.using("default").get().payload["name"], "Palta")
+
+    def test_writes_go_to_the_primary(self):
+        basket = {"lines": [{"product": self.product.pk, "quantity": 2, "sold_price": "10.00"}]}
+        self.client.force_authenticate(User.objects.create_user("caja", is_staff=True))
+        self.assertEqual(self.client.post("/api/orders/", basket, format="json").status_code, 201)
+        self.assertEqual(Sale.objects.using("default").count(), 1)
+        self.assertEqual(Sale.objects.using(REPLICA).count(), 0)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).quantity, 3)
+
+    def test_reads_after_a_write_in_the_same_request_use_the_primary(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Product), "default")
+        token = _replica_reads.set(ReplicaReads())
+        try:
+            self.assertEqual(router.db_for_read(Product), REPLICA)
+            self.assertEqual(router.db_for_write(Sale), "default")
+            self.assertEqual(router.db_for_read(Product), "default")
+        finally:
+            _replica_reads.reset(token)
+
+
+class ImageVariantTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        overrides = self.settings(
+            IMAGE_VARIANTS_ROOT=self.root,
+            IMAGE_VARIANT_WIDTHS=[160, 320, 640],
+            IMAGE_VARIANT_FORMATS=["webp", "avif"],
+            IMAGE_VARIANT_WORKERS=0,
+            IMAGE_VARIANT_HOSTS=[".ucarecdn.test"],
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        download = patch("catalog.images.urlopen", side_effect=self.fake_download)
+        self.urlopen = download.start()
+        self.addCleanup(download.stop)
+        self.product = self.make_product("Aguacate")
+
+    def fake_download(self, url, timeout):
+        buffer = io.BytesIO()
+        Image.new("RGB", (400, 300), "green").save(buffer, "PNG")
+        return io.BytesIO(buffer.getvalue())
+
+    def add_image(self, url):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProductImage.objects.create(product=self.product, image=url, is_primary=True)
+        image.refresh_from_db()
+        return image
+
+    def variant_files(self):
+        return sorted(os.listdir(self.root))
+
+    def test_save_builds_variants_served_as_srcset(self):
+        image = self.add_image("https://a.ucarecdn.test/one/")
+        widths = sorted({file["width"] for file in image.variants["files"]})
+        self.assertEqual(widths, [160, 320, 400])  # never wider than the original
+        self.assertEqual(len(self.variant_files()), 6)
+
+        detail = self.client.get(f"/api/products/{self.product.pk}/").json()
+        srcset = detail["images"][0]["srcset"]
+        self.assertEqual(set(srcset), {"webp", "avif"})
+        self.assertRegex(srcset["webp"], r"^/media/variants/[0-9a-f]{20}-160\.webp 160w, ")
+        self.assertEqual(self.client.get("/api/products/").json()["results"][0]["primary_image"]["srcset"], srcset)
+
+        response = self.client.get(srcset["webp"].split()[0])
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(Image.open(io.BytesIO(b"".join(response.streaming_content))).width, 160)
+
+    def test_imported_images_get_variants(self):
+        path = os.path.join(self.root, "catalog.csv")
+        with open(path, "w") as fh:
+            fh.write(
+                "name,price,category,unit,image\n"
+                "Aguacate,12.50,Frutas,Docena,https://a.ucarecdn.test/one/\n"
+                "Mora,125,Frutas,lb,https://elsewhere.test/mora.jpg\n"
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("import_catalog", path, stdout=StringIO())
+        os.remove(path)
+
+        self.assertEqual(self.urlopen.call_count, 1)
+        self.assertEqual(len(self.product.images.get().variants["files"]), 6)
+        self.assertEqual(ProductImage.objects.get(product__slug="mora").variants, {})
+
+    def test_replaced_and_deleted_images_are_evicted(self):
+        image = self.add_image("https://a.ucarecdn.test/one/")
+        first = self.variant_files()
+        with self.captureOnCommitCallbacks(execute=True):
+            image.image = "https://a.ucarecdn.test/two/"
+            image.save()
+        image.refresh_from_db()
+        self.assertEqual(image.variants["source"], "https://a.ucarecdn.test/two/")
+        # Same pixels, same content hashes: the files are shared, nothing to evict
+        self.assertEqual(self.variant_files(), first)
+
+        open(os.path.join(self.root, "orphan-160.webp"), "wb").close()
+        self.assertEqual(evict_variants(), 0)  # still in its grace period
+        self.assertEqual(evict_variants(grace=0), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertEqual(evict_variants(grace=0), 6)
+        self.assertEqual(self.variant_files(), [])
+        self.assertEqual(self.client.get(f"/media/variants/{first[0]}").status_code, 404)
+
+    def test_other_hosts_are_left_alone(self):
+        image = self.add_image("https://img.test/1")
+        self.urlopen.assert_not_called()
+        self.assertEqual(image.variants, {})
+        images = self.client.get(f"/api/products/{self.product.pk}/").json()["images"]
+        self.assertEqual(images[0]["srcset"], {})
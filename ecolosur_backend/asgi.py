@@ -12,5 +12,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecolosur_backend.settings')
+# Catalog reads go through catalog.async_views (ASYNC_CATALOG=false to opt out)
+os.environ.setdefault('ASYNC_CATALOG', 'true')
+# Django's middleware without a thread hop per hook (utils/middleware.py)
+os.environ.setdefault('INLINE_MIDDLEWARE', 'true')
+# Every request runs its queries in a new thread: connections kept open would pile up
+os.environ.setdefault('CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    "django.contrib.postgres",
     "catalog",
     "rest_framework",
     "django_filters",
@@ -72,21 +73,57 @@ LOGGING = {
 }
 
 REST_FRAMEWORK = {
-    "EXCEPTION_HANDLER": "your_project.utils.logging.custom_exception_handler"
+    "EXCEPTION_HANDLER": "utils.logging.custom_exception_handler",
+    "DEFAULT_RENDERER_CLASSES": [
+        "catalog.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
 
-MIDDLEWARE = [
-    "corsheaders.middleware.CorsMiddleware",   # must be at the very top
+# Cursor pagination for /api/products/ (?page_size= is capped at the max)
+PRODUCTS_PAGE_SIZE = env.int("PRODUCTS_PAGE_SIZE", default=24)
+PRODUCTS_MAX_PAGE_SIZE = env.int("PRODUCTS_MAX_PAGE_SIZE", default=100)
+
+# Render read-only listings with catalog.fast_serializers instead of DRF serializers
+CATALOG_FAST_SERIALIZERS = env.bool("CATALOG_FAST_SERIALIZERS", default=True)
+
+# Serve the catalog's JSON reads from catalog.async_views (on by default under ASGI, see asgi.py)
+ASYNC_CATALOG = env.bool("ASYNC_CATALOG", default=False)
+
+# Samples kept per endpoint for the /api/_stats/ percentiles
+REQUEST_STATS_WINDOW = env.int("REQUEST_STATS_WINDOW", default=1000)
+
+# Bearer token Prometheus scrapes /metrics with (staff sessions are let in too)
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
+# Demand forecasting (catalog.forecast, forecast_demand command)
+FORECAST_HISTORY_DAYS = env.int("FORECAST_HISTORY_DAYS", default=56)
+FORECAST_MA_WINDOW = env.int("FORECAST_MA_WINDOW", default=7)
+FORECAST_SMOOTHING = env.float("FORECAST_SMOOTHING", default=0.3)
+FORECAST_LEAD_TIME_DAYS = env.float("FORECAST_LEAD_TIME_DAYS", default=3)
+FORECAST_SERVICE_Z = env.float("FORECAST_SERVICE_Z", default=1.65)  # ~95% service level
+
+DJANGO_MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
-    'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+# Under ASGI (asgi.py turns this on) the same middleware runs through utils.middleware,
+# which calls the hooks without a thread hop each. It relies on Django 4.2 internals.
+INLINE_MIDDLEWARE = env.bool("INLINE_MIDDLEWARE", default=False)
+if INLINE_MIDDLEWARE:
+    DJANGO_MIDDLEWARE = ["utils.middleware." + path.rsplit(".", 1)[1] for path in DJANGO_MIDDLEWARE]
+
+MIDDLEWARE = [
+    "corsheaders.middleware.CorsMiddleware",   # must be at the very top
+    *DJANGO_MIDDLEWARE,
+    "utils.middleware.WhiteNoiseMiddleware",
+    "utils.request_stats.RequestStatsMiddleware",
+    "utils.db_routers.ReplicaRoutingMiddleware",
 ]
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOWED_ORIGINS = [
@@ -118,6 +155,16 @@ WSGI_APPLICATION = 'ecolosur_backend.wsgi.application'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Resized WebP/AVIF copies of the product and banner images (catalog.images),
+# built after each save and served by WhiteNoise
+IMAGE_VARIANTS_ROOT = os.path.join(MEDIA_ROOT, 'variants')
+IMAGE_VARIANTS_URL = env("IMAGE_VARIANTS_URL", default=MEDIA_URL + "variants/")
+IMAGE_VARIANT_WIDTHS = env.list("IMAGE_VARIANT_WIDTHS", cast=int, default=[160, 320, 640, 1280])
+IMAGE_VARIANT_FORMATS = env.list("IMAGE_VARIANT_FORMATS", default=["avif", "webp"])
+IMAGE_VARIANT_WORKERS = env.int("IMAGE_VARIANT_WORKERS", default=2)  # 0 builds them inline
+# Hosts the originals are downloaded from (Uploadcare's CDN)
+IMAGE_VARIANT_HOSTS = env.list("IMAGE_VARIANT_HOSTS", default=["ucarecdn.com", ".ucarecdn.com", ".ucarecd.net"])
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
@@ -137,6 +184,33 @@ DATABASES = {
     "default": env.db("DATABASE_URL")
 
 }
+# Persistent connections: the database is remote, opening one per request is costly
+for database in DATABASES.values():
+    database["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)
+    database["CONN_HEALTH_CHECKS"] = env.bool("CONN_HEALTH_CHECKS", default=True)
+
+# Optional read replica for the catalog's GET requests (see utils.db_routers)
+if env("REPLICA_DATABASE_URL", default=""):
+    DATABASES["replica"] = {
+        **env.db("REPLICA_DATABASE_URL"),
+        "CONN_MAX_AGE": DATABASES["default"]["CONN_MAX_AGE"],
+        "CONN_HEALTH_CHECKS": DATABASES["default"]["CONN_HEALTH_CHECKS"],
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["utils.db_routers.PrimaryReplicaRouter"]
+# Seconds after a catalog write during which every read uses the primary
+READ_YOUR_WRITES_SECONDS = env.int("READ_YOUR_WRITES_SECONDS", default=5)
+
+
+# Cache
+# Local memory by default; point CACHE_URL at Redis/Memcached (e.g. redis://host:6379/1)
+# to run several workers: gunicorn refuses to start more than one on local memory,
+# since catalog invalidation would not reach the other workers (catalog/checks.py).
+
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+}
+CATALOG_CACHE_TIMEOUT = env.int("CATALOG_CACHE_TIMEOUT", default=60 * 60)
 
 
 # Password validation
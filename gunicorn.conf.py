@@ -0,0 +1,43 @@
+"""
+Gunicorn settings and hooks (gunicorn loads ./gunicorn.conf.py automatically).
+
+``SERVER_MODE=asgi`` serves ``ecolosur_backend.asgi`` with uvicorn workers,
+which turns on the async catalog reads (catalog/async_views.py); the default
+is the WSGI app on sync workers. Start gunicorn without an app argument so
+the mode picks it, e.g. ``SERVER_MODE=asgi gunicorn --workers 4``.
+
+Several workers need a shared cache (CACHE_URL): on the default local-memory
+cache gunicorn refuses to start more than one (catalog/checks.py).
+
+When PROMETHEUS_MULTIPROC_DIR is set, workers share their metrics through
+files in that directory: start from an empty directory and drop the files
+of workers that exit.
+"""
+import os
+import shutil
+
+if os.environ.get("SERVER_MODE") == "asgi":
+    wsgi_app = "ecolosur_backend.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "ecolosur_backend.wsgi:application"
+
+
+def on_starting(server):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ecolosur_backend.settings")
+    from catalog.checks import shared_cache_errors
+
+    for error in shared_cache_errors(server.cfg.workers):
+        raise RuntimeError(f"{error.msg} {error.hint}")
+
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
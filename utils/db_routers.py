@@ -0,0 +1,123 @@
+"""
+Primary/replica routing for the ``replica`` database (``REPLICA_DATABASE_URL``).
+
+Everything uses the primary unless a request opts in: ``ReplicaRoutingMiddleware``
+sends the reads of safe (GET/HEAD/OPTIONS) requests to views whose class sets
+``replica_reads = True`` -- the catalog viewsets -- to the replica.
+
+Replicas lag, so two read-your-writes rules keep reads on the primary:
+
+- once a request writes anything (or calls ``read_from_primary`` before
+  writing what it reads), its remaining reads use the primary;
+- after a committed catalog write (``stay_on_primary``, called when the
+  catalog cache versions move) every request reads from the primary for
+  ``READ_YOUR_WRITES_SECONDS``. The window is kept in the cache, so all
+  workers honour it when the cache is shared. It also keeps a lagging
+  replica from filling the response cache under the new versions.
+"""
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = "replica"
+PRIMARY_UNTIL_KEY = "db:primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_replica_reads = ContextVar("replica_reads", default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def stay_on_primary():
+    """Route every read to the primary for the next ``READ_YOUR_WRITES_SECONDS``."""
+    if replica_configured():
+        window = settings.READ_YOUR_WRITES_SECONDS
+        cache.set(PRIMARY_UNTIL_KEY, time.time() + window, window)
+
+
+def read_from_primary():
+    """Send the rest of the current request's reads to the primary, as a write would."""
+    reads = _replica_reads.get()
+    if reads is not None:
+        reads.allowed = False
+
+
+class ReplicaReads:
+    """Routing state of one request; the write window is checked on its first read."""
+
+    def __init__(self):
+        self.allowed = None
+
+    def use_replica(self):
+        if self.allowed is None:
+            self.allowed = cache.get(PRIMARY_UNTIL_KEY, 0) <= time.time()
+        return self.allowed
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        reads = _replica_reads.get()
+        if reads is not None and reads.use_replica():
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        reads = _replica_reads.get()
+        if reads is not None:
+            # Read your own writes for the rest of the request
+            reads.allowed = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return False if db == REPLICA else None
+
+
+class ReplicaRoutingMiddleware:
+    """Opts safe requests to ``replica_reads`` views into replica reads (see the module docstring)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        try:
+            return self.get_response(request)
+        finally:
+            self.finish(request)
+
+    async def __acall__(self, request):
+        try:
+            return await self.get_response(request)
+        finally:
+            self.finish(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "cls", None)
+        if request.method in SAFE_METHODS and getattr(view_class, "replica_reads", False) and replica_configured():
+            request._replica_reads_token = _replica_reads.set(ReplicaReads())
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        ReplicaRoutingMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
+
+    def finish(self, request):
+        token = getattr(request, "_replica_reads_token", None)
+        if token is not None:
+            _replica_reads.reset(token)
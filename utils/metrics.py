@@ -0,0 +1,55 @@
+"""
+Prometheus metrics for the HTTP layer, and the ``/metrics`` view.
+
+Metrics are kept in-process by ``prometheus_client``. Under gunicorn, set
+``PROMETHEUS_MULTIPROC_DIR`` to a writable directory: each worker then writes
+its samples to memory-mapped files there and ``/metrics`` merges them, so a
+scrape sees the whole server rather than whichever worker answered it (see
+gunicorn.conf.py).
+
+The metrics include sales figures, so ``/metrics`` answers staff sessions and
+requests bearing ``METRICS_TOKEN`` (Prometheus' ``authorization`` scrape
+option), nobody else.
+"""
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+REQUESTS = Counter(
+    "http_requests_total", "Requests handled, per endpoint (ViewSet.action).", ["endpoint", "method", "status"]
+)
+LATENCY = Histogram("http_request_duration_seconds", "Request latency per endpoint.", ["endpoint"])
+QUERIES = Histogram(
+    "http_request_db_queries", "Database queries per request.", ["endpoint"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, float("inf")),
+)
+
+
+def observe_request(endpoint, method, status, seconds, queries):
+    REQUESTS.labels(endpoint, method, status).inc()
+    LATENCY.labels(endpoint).observe(seconds)
+    QUERIES.labels(endpoint).observe(queries)
+
+
+def authorized(request):
+    if request.user.is_staff:
+        return True
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return bool(settings.METRICS_TOKEN) and scheme.lower() == "bearer" and constant_time_compare(
+        token.strip(), settings.METRICS_TOKEN
+    )
+
+
+def metrics_view(request):
+    if not authorized(request):
+        return HttpResponse(status=401, headers={"WWW-Authenticate": 'Bearer realm="metrics"'})
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
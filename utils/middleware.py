@@ -0,0 +1,155 @@
+"""
+The project's middleware, made cheap to run in an async (ASGI) chain.
+
+Django runs every hook of a ``MiddlewareMixin`` middleware through
+``sync_to_async`` when the chain is async: two thread hops per middleware and
+request, which under load cost more than the catalog reads they wrap. The
+hooks of the middleware below do no I/O -- they read headers and cookies and
+set lazy attributes -- so these subclasses call them directly on the event
+loop. The one exception, saving a modified session, still goes to a thread.
+They override ``MiddlewareMixin``'s private ``_async_check``/``__acall__``, so
+they are only used when ``INLINE_MIDDLEWARE`` is on (the ASGI default) and
+refuse to load on another Django release than ``TARGET_DJANGO``.
+
+WhiteNoise's middleware is sync only, which would put the whole chain (async
+views included) in a thread; ``WhiteNoiseMiddleware`` below looks static
+files up on the event loop and only opens them in a thread. It also serves
+the image variants (catalog.images), which are written and evicted while
+the server runs. It only extends WhiteNoise's own API and is always used.
+
+In a sync (WSGI) chain every class here behaves exactly like its parent.
+"""
+import os
+from urllib.parse import urlparse
+
+import django
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import middleware as auth
+from django.contrib.messages import middleware as messages
+from django.contrib.sessions import middleware as sessions
+from django.core.exceptions import ImproperlyConfigured
+from django.middleware import clickjacking, common, csrf, security
+from whitenoise import middleware as whitenoise
+from whitenoise.string_utils import ensure_leading_trailing_slash
+
+# The Django release whose MiddlewareMixin internals InlineHooksMixin replaces
+TARGET_DJANGO = (4, 2)
+
+
+class InlineHooksMixin:
+    """Calls ``process_request``/``process_view``/``process_response`` without a thread hop."""
+
+    def _async_check(self):
+        if django.VERSION[:2] != TARGET_DJANGO:
+            raise ImproperlyConfigured(
+                f"{type(self).__name__} is written against Django {'.'.join(map(str, TARGET_DJANGO))} internals; "
+                "set INLINE_MIDDLEWARE=false or update utils/middleware.py."
+            )
+        super()._async_check()
+        if iscoroutinefunction(self) and hasattr(self, "process_view"):
+            process_view = self.process_view
+
+            async def inline_process_view(request, view_func, view_args, view_kwargs):
+                return process_view(request, view_func, view_args, view_kwargs)
+
+            # Django adapts the hook when it loads the chain, after __init__
+            self.process_view = inline_process_view
+
+    async def __acall__(self, request):
+        response = None
+        if hasattr(self, "process_request"):
+            response = self.process_request(request)
+        response = response or await self.get_response(request)
+        if hasattr(self, "process_response"):
+            response = await self.aprocess_response(request, response)
+        return response
+
+    async def aprocess_response(self, request, response):
+        return self.process_response(request, response)
+
+
+class CommonMiddleware(InlineHooksMixin, common.CommonMiddleware):
+    pass
+
+
+class SecurityMiddleware(InlineHooksMixin, security.SecurityMiddleware):
+    pass
+
+
+class SessionMiddleware(InlineHooksMixin, sessions.SessionMiddleware):
+    async def aprocess_response(self, request, response):
+        if request.session.modified or settings.SESSION_SAVE_EVERY_REQUEST:
+            # The session is saved to its store
+            return await sync_to_async(self.process_response)(request, response)
+        return self.process_response(request, response)
+
+
+class CsrfViewMiddleware(InlineHooksMixin, csrf.CsrfViewMiddleware):
+    pass
+
+
+class AuthenticationMiddleware(InlineHooksMixin, auth.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(InlineHooksMixin, messages.MessageMiddleware):
+    pass
+
+
+class XFrameOptionsMiddleware(InlineHooksMixin, clickjacking.XFrameOptionsMiddleware):
+    pass
+
+
+class WhiteNoiseMiddleware(whitenoise.WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        # Set first: the parent's __init__ runs immutable_file_test on the static files
+        self.variants_root = settings.IMAGE_VARIANTS_ROOT
+        self.variants_prefix = ensure_leading_trailing_slash(urlparse(settings.IMAGE_VARIANTS_URL).path)
+        super().__init__(get_response, **kwargs)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        static_file = self.find_static_file(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        url = request.path_info
+        if self.autorefresh or url.startswith(self.variants_prefix):
+            static_file = await sync_to_async(self.find_static_file)(url)
+        else:
+            static_file = self.files.get(url)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+    def find_static_file(self, url):
+        if url.startswith(self.variants_prefix):
+            return self.find_variant(url)
+        if self.autorefresh:
+            return self.find_file(url)
+        return self.files.get(url)
+
+    def find_variant(self, url):
+        """Variants come and go at runtime: check the disk, keep the headers of the ones found."""
+        path = os.path.join(self.variants_root, url[len(self.variants_prefix):])
+        if not self.url_is_canonical(url) or not os.path.isfile(path):
+            self.files.pop(url, None)
+            return None
+        static_file = self.files.get(url)
+        if static_file is None:
+            static_file = self.files[url] = self.get_static_file(path, url)
+        return static_file
+
+    def immutable_file_test(self, path, url):
+        # Variant names are hashes of their content
+        return url.startswith(self.variants_prefix) or super().immutable_file_test(path, url)
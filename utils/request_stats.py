@@ -0,0 +1,218 @@
+"""
+Per-endpoint request statistics.
+
+``RequestStatsMiddleware`` splits every request that resolves to a view into
+SQL (query count and time, through a connection execute wrapper), view code
+outside SQL (serialization, mostly) and response rendering. Samples are kept
+in a rolling window per endpoint -- ``ViewSet.action`` for DRF viewsets --
+and percentiles are computed on demand for ``/api/_stats/``. Every response
+also carries the numbers in a ``Server-Timing`` header.
+
+Stats live in process memory: with several workers each reports its own share.
+
+The middleware runs in sync and async middleware chains alike. Under ASGI the
+ORM runs in the request's sync thread (see ``asgiref.sync.sync_to_async``),
+so that is where the query timer is attached.
+"""
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .metrics import observe_request
+
+STAGES = ("sql", "serialize", "render", "total")
+PERCENTILES = (50, 95, 99)
+
+
+class QueryTimer:
+    """``connection.execute_wrapper`` that counts queries and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def _percentiles(values, scale=1):
+    ordered = sorted(values)
+    result = {}
+    for p in PERCENTILES:
+        # Nearest-rank percentile
+        value = ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+        result[f"p{p}"] = round(value * scale, 2)
+    result["max"] = round(ordered[-1] * scale, 2)
+    return result
+
+
+class EndpointStats:
+    """Thread-safe rolling window of samples per endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._samples = defaultdict(lambda: deque(maxlen=settings.REQUEST_STATS_WINDOW))
+            self._requests = defaultdict(int)
+
+    def record(self, endpoint, queries, timings):
+        sample = (queries, *(timings[stage] for stage in STAGES))
+        with self._lock:
+            self._samples[endpoint].append(sample)
+            self._requests[endpoint] += 1
+
+    def snapshot(self):
+        """``{endpoint: {requests, window, queries, sql_ms, serialize_ms, render_ms, total_ms}}``."""
+        with self._lock:
+            samples = {endpoint: list(window) for endpoint, window in self._samples.items()}
+            requests = dict(self._requests)
+        report = {}
+        for endpoint in sorted(samples):
+            queries, *stages = zip(*samples[endpoint])
+            entry = {"requests": requests[endpoint], "window": len(queries), "queries": _percentiles(queries)}
+            for stage, seconds in zip(STAGES, stages):
+                entry[f"{stage}_ms"] = _percentiles(seconds, scale=1000)
+            report[endpoint] = entry
+        return report
+
+
+endpoint_stats = EndpointStats()
+
+
+def endpoint_name(request):
+    """``ViewSet.action`` for DRF viewsets, the URL name for other views."""
+    match = request.resolver_match
+    if match is None:
+        return None
+    view_class = getattr(match.func, "cls", None)
+    if view_class is None:
+        return match.view_name or match._func_path
+    method = request.method.lower()
+    actions = getattr(match.func, "actions", None) or {}
+    return f"{view_class.__name__}.{actions.get(method, method)}"
+
+
+class _RequestTimings:
+    def __init__(self):
+        self.queries = QueryTimer()
+        self.start = time.perf_counter()
+        self.view_start = self.view_end = self.render_end = None
+        self.view_sql_start = self.view_sql_end = 0.0
+
+    def rendered(self, response):
+        self.render_end = time.perf_counter()
+
+    def stages(self):
+        end = time.perf_counter()
+        sql = self.queries.seconds
+        render = 0.0
+        if self.view_end is not None and self.render_end is not None:
+            render = self.render_end - self.view_end
+        if self.view_start is not None:
+            if self.view_end is None:
+                # Plain or streaming response: no separate render step
+                view_time, view_sql = end - self.view_start, sql - self.view_sql_start
+            else:
+                view_time, view_sql = self.view_end - self.view_start, self.view_sql_end - self.view_sql_start
+            serialize = max(0.0, view_time - view_sql)
+        else:
+            serialize = 0.0
+        return {"sql": sql, "serialize": serialize, "render": render, "total": end - self.start}
+
+
+class RequestStatsMiddleware:
+    """
+    Records query count, SQL time, serializer time and render time per endpoint.
+
+    Serializer time is the time spent in the view outside SQL: DRF serializes
+    inside the action, so that is where it shows up. Render time covers the
+    renderer, measured through the response's post-render callback.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Coroutine hooks, or Django would run each one through a thread
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings = request._request_timings = _RequestTimings()
+        with self.timed_queries(timings):
+            response = self.get_response(request)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = request._request_timings = _RequestTimings()
+        stack = await sync_to_async(self.timed_queries)(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, timings)
+
+    def timed_queries(self, timings):
+        """Attach ``timings.queries`` to this thread's connections until the stack closes."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timings.queries))
+        return stack
+
+    def finish(self, request, response, timings):
+        endpoint = endpoint_name(request)
+        if endpoint is None:
+            return response
+        stages = timings.stages()
+        endpoint_stats.record(endpoint, timings.queries.count, stages)
+        observe_request(endpoint, request.method, response.status_code, stages["total"], timings.queries.count)
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={stages["sql"] * 1000:.2f};desc="{timings.queries.count} queries"',
+            *(f"{stage};dur={stages[stage] * 1000:.2f}" for stage in STAGES[1:]),
+        ])
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.view_started(request)
+
+    def process_template_response(self, request, response):
+        return self.view_finished(request, response)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.view_started(request)
+
+    async def aprocess_template_response(self, request, response):
+        return self.view_finished(request, response)
+
+    def view_started(self, request):
+        timings = request._request_timings
+        timings.view_start = time.perf_counter()
+        timings.view_sql_start = timings.queries.seconds
+
+    def view_finished(self, request, response):
+        # DRF responses are template responses: the view is done, rendering is next
+        timings = request._request_timings
+        timings.view_end = time.perf_counter()
+        timings.view_sql_end = timings.queries.seconds
+        response.add_post_render_callback(timings.rendered)
+        return response